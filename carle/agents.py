@@ -8,6 +8,7 @@ import torch.nn.functional as F
 
 from carle.env import CARLE
 from carle.mcl import RND2D, AE2D 
+from carle.recorder import FrameRecorder
 
 import matplotlib.pyplot as plt
 
@@ -109,100 +110,85 @@ if __name__ == "__main__":
     #mouse_maze: 12345/37
     #walled_cities: 2345/45678
 
-    my_steps = 512
     fs = 18
+    instances = 4
+
+    def plot_rewards(rewards, title, filepath):
+
+        fig = plt.figure(figsize=(6,6))
+        plt.plot(rewards, lw=3)
+        plt.xlabel("steps", fontsize=fs)
+        plt.xticks(fontsize=fs-2)
+        plt.yticks(fontsize=fs-2)
+        plt.title(title, fontsize=fs+4)
+        plt.savefig(filepath)
+        plt.close(fig)
 
     for wrapper, wrapper_name in zip([AE2D, RND2D], ["AE2D", "RND2D"]):
-        for rules, name in zip([[[2,3],[3]], [[1,2,3,4,5],[3,7]]],\
+        for rules, name in zip(["B3/S23", "B37/S12345"], \
                 ["life", "mouse_maze"]):
-            env_fn = AutomaticCellularEnvironment 
-            env = wrapper(env_fn)
 
-            env.env.survive = rules[0]
-            env.env.birth = rules[1]
-            env.env.instances = 1
-            env.env.batch_size = 32
+            my_steps = 512
 
+            env = CARLE(instances=instances)
+            env.rules_from_string(rules)
+            env = wrapper(env)
 
-            action = torch.zeros(env.env.instances, 1, \
-                   env.env.action_width, env.env.action_height)
+            action = torch.zeros(instances, 1, \
+                   env.inner_env.action_height, env.inner_env.action_width)
     
             for ii in range(1,30,14):
-                action[0,0,8:16,ii+0:ii+3] = 1.0
-                action[0,0,9,ii+1] = 0.0
-                action[0,0,14,ii+1] = 0.0
+                action[:,0,8:16,ii+0:ii+3] = 1.0
+                action[:,0,9,ii+1] = 0.0
+                action[:,0,14,ii+1] = 0.0
+
+            recorder = FrameRecorder("./frames/pentadecathlon_{}wrapper_{}.gif"\
+                    .format(wrapper_name, name), instances=instances)
+
             obs = env.reset()
             rewards = []
-            steps = []
             for step in range(my_steps):
 
                 obs, reward, done, info = env.step(action)
                 action *= 0.0
 
-                rewards.append(reward.squeeze().detach().cpu().numpy())
-                steps.append(step)
-
-                #env.env.save_frame()
-
-                fig = plt.figure(figsize=(6,12))
-                plt.subplot(211)
-                plt.plot(steps, rewards, lw=3)
-                plt.plot(steps[-1], rewards[-1], "o", ms=5)
-                plt.xlabel("steps", fontsize=fs)
-                plt.xticks(fontsize=fs-2)
-                plt.yticks(fontsize=fs-2)
-                plt.title("{} CA with {} reward\n"\
-                        .format(name, wrapper_name), fontsize=fs+4)
-                plt.subplot(212)
-                plt.imshow(obs[0,0,:,:].detach().cpu().numpy(),cmap="magma")
-                plt.xticks(fontsize=fs-2)
-                plt.yticks(fontsize=fs-2)
-                #plt.tight_layout()
-                plt.savefig("./frames/pentadecathlon_{}wrapper_{}_step{}"\
-                        .format(wrapper_name, name, step))
-                plt.close(fig)
+                rewards.append(reward.mean().item())
+                recorder.add(obs)
+
+            recorder.close()
+
+            plot_rewards(rewards, "{} CA with {} reward\n"\
+                    .format(name, wrapper_name), \
+                    "./frames/pentadecathlon_{}wrapper_{}_rewards"\
+                    .format(wrapper_name, name))
 
         my_steps = 1024
 
-        action = torch.ones(1,1,32,32)
-        for rules, name in zip([[[2,3],[3]], [[1,2,3,4,5],[3,7]]],\
+        for rules, name in zip(["B3/S23", "B37/S12345"], \
                 ["life", "mouse_maze"]):
             agent = RandomAgent() 
-            env_fn = AutomaticCellularEnvironment 
-            env = wrapper(env_fn)
 
-            env.env.survive = rules[0]
-            env.env.birth = rules[1]
-            env.env.instances = 1
-            env.env.batch_size = 32
+            env = CARLE(instances=instances)
+            env.rules_from_string(rules)
+            env = wrapper(env)
 
+            recorder = FrameRecorder("./frames/random_{}wrapper_{}.gif"\
+                    .format(wrapper_name, name), instances=instances)
 
             obs = env.reset()
             rewards = []
-            steps = []
-            print("toggle rate: ", action.mean())
+            print("toggle rate: ", agent.toggle_rate)
             for step in range(my_steps):
 
                 action = agent(obs)
                 obs, reward, done, info = env.step(action)
 
-                rewards.append(reward.squeeze().detach().cpu().numpy())
-                steps.append(step)
-
-                fig = plt.figure(figsize=(6,12))
-                plt.subplot(211)
-                plt.plot(steps, rewards, lw=3)
-                plt.plot(steps[-1], rewards[-1], "o", ms=5)
-                plt.xlabel("steps", fontsize=fs)
-                plt.xticks(fontsize=fs-2)
-                plt.yticks(fontsize=fs-2)
-                plt.title("{} CA with {} reward"\
-                        .format(name, wrapper_name), fontsize=fs+4)
-                plt.subplot(212)
-                plt.imshow(obs[0,0,:,:].detach().cpu().numpy(),cmap="magma")
-                plt.xticks(fontsize=fs-2)
-                plt.yticks(fontsize=fs-2)
-                #plt.tight_layout()
-                plt.savefig("./frames/random_{}wrapper_{}_step{}"\
-                        .format(wrapper_name, name, step))
-                plt.close(fig)
+                rewards.append(reward.mean().item())
+                recorder.add(obs)
+
+            recorder.close()
+
+            plot_rewards(rewards, "{} CA with {} reward"\
+                    .format(name, wrapper_name), \
+                    "./frames/random_{}wrapper_{}_rewards"\
+                    .format(wrapper_name, name))
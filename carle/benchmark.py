@@ -0,0 +1,217 @@
+"""
+CA throughput benchmarks for CARLE
+
+    Sweeps instances, grid size, rule and backend, and reports steps/sec,
+    cells/sec, p50/p99 step latency and peak resident memory. Each
+    configuration runs in its own process by default, so peak memory is per
+    configuration. Results are written as JSON and can be compared against a
+    stored baseline.
+
+    Usage:
+        python -m carle.benchmark --instances 1 64 --sizes 64 256 \\
+                --backends conv bitboard --output results.json \\
+                --baseline baseline.json
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import multiprocessing
+import json
+import platform
+import resource
+import sys
+import time
+
+import numpy as np
+import torch
+
+from carle.env import CARLE
+
+# CARLE keyword arguments for each backend
+BACKENDS = {"conv": {}, \
+        "conv-uint8": {"storage_dtype": "uint8"}, \
+        "conv-bool": {"storage_dtype": "bool"}, \
+        "preallocate": {"preallocate": True}, \
+        "compile": {"compile": True}, \
+        "bitboard": {"engine": "bitboard"}, \
+        "tiles": {"engine": "tiles"}}
+
+METRICS = ["steps_per_second", "cells_per_second", \
+        "p50_latency", "p99_latency", "peak_rss_mb"]
+
+
+def peak_rss_mb():
+    """
+    peak resident set size of this process so far, in MB (a high-water mark
+    over the process lifetime, see `run` with `isolate`)
+    """
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # kilobytes on Linux, bytes on macOS
+    if sys.platform == "darwin":
+        return peak / 2**20
+
+    return peak / 2**10
+
+def benchmark(instances=1, size=256, rule="B3/S23", backend="conv", \
+        steps=128, warmup=16, alive_rate=0.3, device="cpu"):
+    """
+    time `steps` single steps (after `warmup` untimed steps) of a random soup,
+    returns a dict of the configuration and metrics
+    """
+
+    action_size = min(64, size // 2)
+
+    env = CARLE(instances=instances, height=size, width=size, \
+            action_height=action_size, action_width=action_size, \
+            device=device, **BACKENDS[backend])
+    env.rules_from_string(rule)
+    _ = env.reset()
+
+    env.universe = (torch.rand(instances, 1, size, size) < alive_rate)\
+            .to(env.storage_dtype).to(env.my_device)
+
+    action = torch.zeros(1, 1, env.action_height, env.action_width)\
+            .to(env.my_device)
+
+    def synchronize():
+
+        if env.my_device.type == "cuda":
+            torch.cuda.synchronize()
+
+    for step in range(warmup):
+        _ = env.step(action)
+
+    synchronize()
+
+    latencies = []
+    for step in range(steps):
+
+        t0 = time.perf_counter()
+
+        _ = env.step(action)
+        synchronize()
+
+        latencies.append(time.perf_counter() - t0)
+
+    total = sum(latencies)
+
+    return {"instances": instances, "size": size, "rule": rule, \
+            "backend": backend, "steps": steps, \
+            "steps_per_second": steps / total, \
+            "cells_per_second": steps * instances * size**2 / total, \
+            "p50_latency": float(np.percentile(latencies, 50)), \
+            "p99_latency": float(np.percentile(latencies, 99)), \
+            "peak_rss_mb": peak_rss_mb()}
+
+def config_key(result):
+
+    return (result["instances"], result["size"], result["rule"], \
+            result["backend"])
+
+def compare(results, baseline, tolerance=0.1):
+    """
+    compare results with baseline results (matched by instances, size, rule
+    and backend), returns a list of (key, ratio) for configurations whose
+    steps/sec fell by more than `tolerance` (a fraction)
+    """
+
+    baseline = {config_key(result): result for result in baseline["results"]}
+
+    regressions = []
+    for result in results["results"]:
+
+        key = config_key(result)
+
+        if key in baseline:
+            ratio = result["steps_per_second"] \
+                    / baseline[key]["steps_per_second"]
+
+            result["baseline_ratio"] = ratio
+
+            if ratio < 1.0 - tolerance:
+                regressions.append((key, ratio))
+
+    return regressions
+
+def run(instances=[1], sizes=[256], rules=["B3/S23"], backends=["conv"], \
+        steps=128, warmup=16, device="cpu", isolate=True):
+    """
+    benchmark every combination of instances, sizes, rules and backends
+
+        isolate - run each configuration in a fresh process, so that peak
+            memory is measured per configuration (it includes the
+            interpreter and torch). Otherwise every configuration runs in
+            this process, and peak memory is the process-wide high-water mark
+    """
+
+    results = []
+    for config in itertools.product(instances, sizes, rules, backends):
+
+        if isolate:
+            with ProcessPoolExecutor(max_workers=1, \
+                    mp_context=multiprocessing.get_context("spawn")) as executor:
+                result = executor.submit(benchmark, *config, steps=steps, \
+                        warmup=warmup, device=device).result()
+        else:
+            result = benchmark(*config, steps=steps, warmup=warmup, \
+                    device=device)
+
+        result["isolated"] = isolate
+        results.append(result)
+
+        print("{:>6} x {:>4}^2 {:<14} {:<12} {:.3e} cells/s, "\
+                "{:.1f} steps/s, p50 {:.2e} s, p99 {:.2e} s, {:.0f} MB"\
+                .format(*config, result["cells_per_second"], \
+                result["steps_per_second"], result["p50_latency"], \
+                result["p99_latency"], result["peak_rss_mb"]))
+
+    return {"meta": {"torch": torch.__version__, \
+                "python": platform.python_version(), \
+                "platform": platform.platform(), \
+                "threads": torch.get_num_threads(), \
+                "device": device, "time": int(time.time())}, \
+            "results": results}
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="CARLE throughput benchmarks")
+
+    parser.add_argument("--instances", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 256])
+    parser.add_argument("--rules", nargs="+", default=["B3/S23"])
+    parser.add_argument("--backends", nargs="+", default=["conv"], \
+            choices=list(BACKENDS.keys()))
+    parser.add_argument("--steps", type=int, default=128)
+    parser.add_argument("--warmup", type=int, default=16)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--no-isolate", action="store_true", \
+            help="run all configurations in this process (faster, but peak "\
+            "memory is then process-wide)")
+    parser.add_argument("--output", default=None, \
+            help="write results to this JSON file")
+    parser.add_argument("--baseline", default=None, \
+            help="compare steps/sec with results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.1, \
+            help="allowed fractional slowdown against the baseline")
+
+    args = parser.parse_args()
+
+    results = run(args.instances, args.sizes, args.rules, args.backends, \
+            args.steps, args.warmup, args.device, not args.no_isolate)
+
+    regressions = []
+    if args.baseline is not None:
+        with open(args.baseline, "r") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+
+        for key, ratio in regressions:
+            print("regression: {} at {:.2f}x baseline steps/s".format(key, ratio))
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    sys.exit(1 if len(regressions) else 0)
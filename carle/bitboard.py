@@ -0,0 +1,167 @@
+"""
+bit-packed universe storage and a bit-parallel update for Life-like CA
+
+    Each row of a CARLE universe is stored as 64-bit words, one bit per cell.
+    Moore neighborhood sums are computed for 64 cells at a time with full-adder
+    logic, and circular (toroidal) padding is handled with word shifts and rolls.
+
+    Packed universes have shape (instances, height, width // 64) and dtype int64.
+    Bit jj of word kk holds the cell in column 64 * kk + jj.
+"""
+
+import torch
+
+# all bits except the sign bit, used to make `>>` a logical (not arithmetic) shift
+LOW_BITS = 0x7FFFFFFFFFFFFFFF
+
+
+def full_adder(a, b, c):
+
+    partial = a ^ b
+
+    return partial ^ c, (a & b) | (c & partial)
+
+def half_adder(a, b):
+
+    return a ^ b, a & b
+
+class BitBoard():
+
+    def __init__(self, height, width, device=torch.device("cpu")):
+
+        assert width % 64 == 0, \
+                f"bitboard engine needs a width divisible by 64, not {width}"
+
+        self.height = height
+        self.width = width
+        self.words = width // 64
+        self.my_device = device
+
+        self.bit_shifts = torch.arange(64, dtype=torch.int64).to(self.my_device)
+
+    def zeros(self, instances):
+
+        return torch.zeros(instances, self.height, self.words, \
+                dtype=torch.int64, device=self.my_device)
+
+    def pack(self, universe):
+        """
+        pack a (instances, 1, height, width) universe (any dtype) into words
+        """
+
+        cells = universe.reshape(universe.shape[0], self.height, self.words, 64)
+        cells = (cells != 0).to(torch.int64)
+
+        # bits are disjoint, so a sum is the same as a bitwise or
+        return torch.sum(cells << self.bit_shifts, dim=-1)
+
+    def unpack(self, packed, dtype=torch.float32):
+
+        cells = (packed.unsqueeze(-1) >> self.bit_shifts) & 1
+
+        return cells.reshape(packed.shape[0], 1, self.height, self.width).to(dtype)
+
+    def shift_west(self, packed):
+        """
+        each cell takes the value of its neighbor to the left (column - 1)
+        """
+
+        carry = (torch.roll(packed, 1, dims=-1) >> 63) & 1
+
+        return (packed << 1) | carry
+
+    def shift_east(self, packed):
+        """
+        each cell takes the value of its neighbor to the right (column + 1)
+        """
+
+        carry = torch.roll(packed, -1, dims=-1) << 63
+
+        return ((packed >> 1) & LOW_BITS) | carry
+
+    def neighbor_count(self, packed):
+        """
+        bit-sliced Moore neighborhood sums, returned as 4 bit planes
+        (least significant first)
+        """
+
+        west = self.shift_west(packed)
+        east = self.shift_east(packed)
+
+        neighbors = [west, east]
+        for row in [packed, west, east]:
+            neighbors.append(torch.roll(row, 1, dims=-2))
+            neighbors.append(torch.roll(row, -1, dims=-2))
+
+        sum_a, carry_a = full_adder(*neighbors[0:3])
+        sum_b, carry_b = full_adder(*neighbors[3:6])
+        sum_c, carry_c = half_adder(*neighbors[6:8])
+
+        bit_0, carry_d = full_adder(sum_a, sum_b, sum_c)
+
+        twos, carry_e = full_adder(carry_a, carry_b, carry_c)
+        bit_1, carry_f = half_adder(twos, carry_d)
+        bit_2, bit_3 = half_adder(carry_e, carry_f)
+
+        return [bit_0, bit_1, bit_2, bit_3]
+
+    def rule_masks(self, rule_table):
+        """
+        convert a next-state table (18 entries, or 18 per instance, see
+        CARLE.update_rule_table) into the rule representation used by `step`
+        """
+
+        if rule_table.shape[0] == 18:
+            # a single rule, kept as lists of birth and survive counts
+            table = rule_table.tolist()
+
+            return [[count for count in range(9) if table[count]], \
+                    [count for count in range(9) if table[9 + count]]]
+
+        # per-instance rules, as words of all ones (-1) or all zeros
+        masks = -(rule_table.reshape(-1, 18) != 0).to(torch.int64)
+
+        return masks.reshape(-1, 18, 1, 1)
+
+    def step(self, packed, rule_masks):
+        """
+        advance packed universes one generation under B/S rule(s) from
+        `rule_masks`
+        """
+
+        bits = self.neighbor_count(packed)
+        not_bits = [~bit for bit in bits]
+
+        def count_mask(count):
+
+            mask = None
+            for place in range(4):
+                bit = bits[place] if (count >> place) & 1 else not_bits[place]
+                mask = bit if mask is None else mask & bit
+
+            return mask
+
+        universe_1 = torch.zeros_like(packed)
+
+        if isinstance(rule_masks, list):
+
+            birth, survive = rule_masks
+
+            for count in range(9):
+
+                if count in birth and count in survive:
+                    universe_1 |= count_mask(count)
+                elif count in birth:
+                    universe_1 |= count_mask(count) & ~packed
+                elif count in survive:
+                    universe_1 |= count_mask(count) & packed
+        else:
+
+            for count in range(9):
+
+                next_state = (rule_masks[:, count] & ~packed) \
+                        | (rule_masks[:, 9 + count] & packed)
+
+                universe_1 |= count_mask(count) & next_state
+
+        return universe_1
@@ -1,6 +1,6 @@
 import os
 import time
-from functools import reduce
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import matplotlib.pyplot as plt
@@ -12,6 +12,35 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
+from carle.bitboard import BitBoard
+from carle.hashlife import HashLife
+from carle.tiles import ActiveTiles
+from carle.rle import run_tokens, wrap_tokens, decode_rle
+from carle.trajectory import TrajectoryWriter
+from carle.sink import AsyncSink, RotatingFile
+from carle.terminal import TerminalRenderer
+
+def fused_step(universe, rule_table, rule_offsets=None):
+    """
+    one generation (toroidal Moore neighborhood and rule lookup) as a single
+    traceable function, for torch.compile. `rule_table` must have the
+    universe's dtype
+    """
+
+    cells = universe.to(torch.int64)
+
+    row_sum = cells + torch.roll(cells, 1, dims=-1) + torch.roll(cells, -1, dims=-1)
+    block_sum = row_sum + torch.roll(row_sum, 1, dims=-2) \
+            + torch.roll(row_sum, -1, dims=-2)
+
+    # 9 * cells + neighbors, where neighbors = block_sum - cells
+    rule_index = 8 * cells + block_sum
+
+    if rule_offsets is not None:
+        rule_index = rule_index + rule_offsets
+
+    return torch.take(rule_table, rule_index)
+
 class CARLE(nn.Module):
 
     def __init__(self, **kwargs):
@@ -37,14 +66,104 @@ class CARLE(nn.Module):
 
         self.use_grad = kwargs.get("use_grad", False)
 
+        # fraction of cells alive after `reset` and `reset_instances` (seeding)
         self.alive_rate = kwargs.get("alive_rate", 0.0)
 
+        # with `max_steps`, instances are reset (see `reset_instances`) after
+        # that many steps of their own, and report done
+        self.max_steps = kwargs.get("max_steps", None)
+
         # instances define how many CA universes to run in parallel via vectorization
         self.instances = kwargs.get("instances", 1)
 
         # keep track of universe development
         self.logging = kwargs.get("logging", False)
 
+        # "rle" keeps rle strings for instance 0 in memory (saved as csv),
+        # "trajectory" streams all instances to a binary trajectory file
+        # (see carle.trajectory)
+        self.log_format = kwargs.get("log_format", "rle")
+        self.keyframe_interval = kwargs.get("keyframe_interval", 64)
+        self.trajectory = None
+
+        assert self.log_format in ["rle", "trajectory"], \
+                f"unknown log format {self.log_format}"
+
+        # with `async_io`, logging, save_rle and save_frame only snapshot
+        # tensors and queue the encoding and writes for a worker thread
+        # (see carle.sink). rle logs are then streamed to a csv file that is
+        # rotated after `max_log_bytes`
+        self.async_io = kwargs.get("async_io", False)
+        self.max_log_bytes = kwargs.get("max_log_bytes", None)
+        self.log_file = None
+
+        if self.async_io:
+            self.sink = AsyncSink(kwargs.get("io_queue", 64), \
+                    kwargs.get("io_policy", "block"))
+        else:
+            self.sink = None
+
+        # "conv" counts neighbors with a convolution on a float universe,
+        # "bitboard" stores rows as packed 64-bit words (width must be a
+        # multiple of 64) and counts neighbors with bit-parallel adders,
+        # "tiles" only recomputes tiles (of `tile_size` cells) near activity
+        self.engine = kwargs.get("engine", "conv")
+
+        assert self.engine in ["conv", "bitboard", "tiles"], \
+                f"unknown engine {self.engine}"
+
+        if self.engine == "bitboard":
+            self.bitboard = BitBoard(self.height, self.width, self.my_device)
+        elif self.engine == "tiles":
+            self.tiles = ActiveTiles(self.height, self.width, \
+                    kwargs.get("tile_size", 16), self.my_device)
+
+        # universes can be stored as float32 (default), uint8 or bool.
+        # integer storage counts neighbors with integer arithmetic and only
+        # converts to float32 for observations
+        self.storage_dtype = kwargs.get("storage_dtype", torch.float32)
+
+        if isinstance(self.storage_dtype, str):
+            self.storage_dtype = getattr(torch, self.storage_dtype)
+
+        assert self.storage_dtype in [torch.float32, torch.uint8, torch.bool], \
+                f"unsupported storage dtype {self.storage_dtype}"
+
+        # with `preallocate`, universes are double-buffered and stepped with
+        # in-place ops into persistent scratch tensors, and step returns views
+        # of reward and done buffers that are zeroed and reused every step
+        # (clone them to keep values across steps). Observations are still
+        # new tensors. info becomes a dict of per-instance tensors,
+        # e.g. info["reset"]
+        self.preallocate = kwargs.get("preallocate", False)
+        self.universe_buffers = None
+
+        # with `compile`, the conv engine steps with `fused_step` compiled by
+        # torch.compile, one compiled variant per rule table shape and dtype
+        # (so rule changes reuse variants). Falls back to eager `fused_step`
+        # if compilation isn't available
+        self.compile = kwargs.get("compile", False)
+        self.compiled_steps = {}
+
+        if self.compile and not hasattr(torch, "compile"):
+            print("warning, torch.compile not available, using eager fused_step")
+
+        # created by the first call to `render`, and rebuilt when it's
+        # called with different keyword arguments
+        self.renderer = None
+        self.renderer_kwargs = None
+
+        # worker thread and pending step for `step_async`
+        self.executor = None
+        self.pending_step = None
+
+        # decoded rle files, by path
+        self.rle_files = {}
+
+        # HashLife engines for fast_forward, one per rule string
+        self.hashlife_engines = {}
+        self.hashlife_nodes = kwargs.get("hashlife_nodes", 2**20)
+
         self.set_neighborhood()
         self.set_action_padding()
 
@@ -53,6 +172,11 @@ class CARLE(nn.Module):
         self.birth = [3]
         self.survive = [2,3]
 
+        # next-state lookup tables, compiled once per rule string
+        self.rule_tables = {}
+        self.instance_rules = None
+        self.update_rule_table()
+
 
     def birth_rule_from_string(self, my_string="B3"):
         self.birth = []
@@ -63,6 +187,9 @@ class CARLE(nn.Module):
         self.birth = list(set(self.birth))
         self.birth.sort()
 
+        self.instance_rules = None
+        self.update_rule_table()
+
     def survive_rule_from_string(self, my_string="S23"):
         self.survive = []
         for element in my_string:
@@ -72,13 +199,138 @@ class CARLE(nn.Module):
         self.survive = list(set(self.survive))
         self.survive.sort()
 
+        self.instance_rules = None
+        self.update_rule_table()
+
     def rules_from_string(self, my_string="B3/S23"):
+        """
+        set B/S rules from a string, e.g. "B3/S23", or from a list of
+        strings with one rule per instance
+        """
+
+        if isinstance(my_string, (list, tuple)):
+            self.set_instance_rules(my_string)
+
+            return
 
         temp = my_string.split("/")
 
         self.birth_rule_from_string(temp[0])
         self.survive_rule_from_string(temp[1])
 
+    def split_rule_string(self, rule_string):
+        """
+        "B36/S23" -> [3, 6], [2, 3]
+        """
+
+        birth, survive = rule_string.split("/")
+
+        birth = [int(bb) for bb in birth if bb in self.allowed_rules]
+        survive = [int(ss) for ss in survive if ss in self.allowed_rules]
+
+        return birth, survive
+
+    def set_instance_rules(self, rule_strings):
+        """
+        give each instance in the batch its own B/S rule, e.g.
+        `["B3/S23", "B368/S245", "B3678/S34678", "B3/S023"]`
+
+        `birth` and `survive` then follow the first instance's rule
+        """
+
+        assert len(rule_strings) == self.instances, \
+                f"expected {self.instances} rules, got {len(rule_strings)}"
+
+        instance_rules = []
+        for rule_string in rule_strings:
+            self.rules_from_string(rule_string)
+            instance_rules.append(self.get_rule_string())
+
+        self.rules_from_string(instance_rules[0])
+        self.instance_rules = instance_rules
+
+        self.update_rule_table()
+
+    def get_rule_string(self, instance_index=None):
+
+        if instance_index is not None and self.instance_rules is not None:
+            return self.instance_rules[instance_index]
+
+        rule_string = "B" + "".join([str(bb) for bb in self.birth])
+        rule_string += "/S" + "".join([str(ss) for ss in self.survive])
+
+        return rule_string
+
+    def compile_rule(self, birth, survive):
+        """
+        compile B/S rules into an 18-entry next-state table, indexed by
+        `state * 9 + neighbor_count`. Tables are cached per rule string, so
+        switching between rulesets doesn't rebuild them.
+        """
+
+        rule_string = "B" + "".join([str(bb) for bb in birth])
+        rule_string += "/S" + "".join([str(ss) for ss in survive])
+
+        if rule_string not in self.rule_tables:
+
+            rule_table = torch.zeros(18)
+
+            for bb in birth:
+                rule_table[bb] = 1.0
+            for ss in survive:
+                rule_table[9 + ss] = 1.0
+
+            # the same table packed into the bits of one integer, used to look
+            # up next states for integer universes without int64 indices
+            # (1-dimensional, so it isn't demoted to uint8 by type promotion)
+            rule_bits = torch.tensor([sum([1 << ii for ii in range(18) \
+                    if rule_table[ii]])], dtype=torch.int32)
+
+            self.rule_tables[rule_string] = (rule_table.to(self.my_device), \
+                    rule_bits.to(self.my_device))
+
+        return self.rule_tables[rule_string]
+
+    def update_rule_table(self):
+        """
+        set the lookup tables used by `step` for the current rule(s)
+
+        with per-instance rules, tables are stacked to shape [instances * 18]
+        and each instance indexes its own slice via `rule_offsets`
+        """
+
+        self.rule_string = self.get_rule_string()
+        self.rule_offsets = None
+
+        if self.instance_rules is None:
+            self.rule_table, self.rule_bits = \
+                    self.compile_rule(self.birth, self.survive)
+        else:
+            tables = []
+            bits = []
+            for rule_string in self.instance_rules:
+                rule_table, rule_bits = self.compile_rule(\
+                        *self.split_rule_string(rule_string))
+
+                tables.append(rule_table)
+                bits.append(rule_bits)
+
+            instances = len(self.instance_rules)
+
+            self.rule_table = torch.cat(tables)
+            self.rule_bits = torch.cat(bits).reshape(instances, 1, 1, 1)
+            self.rule_offsets = 18 * torch.arange(instances, \
+                    device=self.my_device).reshape(instances, 1, 1, 1)
+
+        # the same table in the universe dtype, for in-place stepping
+        self.storage_rule_table = self.rule_table.to(self.storage_dtype)
+
+        if self.engine == "bitboard":
+            self.rule_masks = self.bitboard.rule_masks(self.rule_table)
+        elif self.engine == "tiles":
+            # tiles that were static under the old rule may change now
+            self.active_tiles = self.tiles.ones(self.instances)
+
     def set_neighborhood(self):
         """
         Establish the neighborhood function as a convolutional layer
@@ -120,26 +372,198 @@ class CARLE(nn.Module):
         width_padding = (self.width - self.action_width) // 2
         height_padding = (self.height - self.action_height) // 2
 
+        # ZeroPad2d takes (left, right, top, bottom)
         self.action_padding = nn.ZeroPad2d(padding=\
-                (height_padding, height_padding + assymetry_height,\
-                width_padding, width_padding + assymetry_width))
+                (width_padding, width_padding + assymetry_width,\
+                height_padding, height_padding + assymetry_height))
+
+    @property
+    def universe(self):
+
+        if self._universe is None:
+            # packed engines only unpack the dense universe when it's requested
+            self._universe = self.bitboard.unpack(self.packed_universe, \
+                    dtype=self.storage_dtype)
+
+        return self._universe
+
+    @universe.setter
+    def universe(self, universe):
+
+        self._universe = universe
+        self._observation = None
+
+        if self.engine == "bitboard":
+            self.packed_universe = self.bitboard.pack(universe)
+        elif self.engine == "tiles":
+            # any cell may have changed, so every tile is recomputed next step
+            self.active_tiles = self.tiles.ones(universe.shape[0])
+
+    def set_packed_universe(self, packed_universe):
 
-    def reset(self):
+        self.packed_universe = packed_universe
+        self._universe = None
+        self._observation = None
 
-        self.universe = torch.zeros(self.instances, 1, self.height, self.width)
+    def allocate_buffers(self):
+        """
+        persistent universe, scratch and output buffers for `preallocate` mode
+        """
+
+        shape = (self.instances, 1, self.height, self.width)
+
+        self.universe_buffers = [torch.zeros(shape, dtype=self.storage_dtype, \
+                device=self.my_device) for ii in range(2)]
+
+        # circularly padded universe and next-state indices, as int64 for
+        # index_select
+        self.padded_buffer = torch.zeros(self.instances, 1, \
+                self.height + 2, self.width + 2, dtype=torch.int64, \
+                device=self.my_device)
+        self.index_buffer = torch.zeros(shape, dtype=torch.int64, \
+                device=self.my_device)
+
+        self.neighbor_views = [self.padded_buffer[:, :, \
+                row:row + self.height, col:col + self.width] \
+                for row in range(3) for col in range(3) \
+                if (row, col) != (1, 1)]
+
+        self.reward_buffer = torch.zeros(self.instances, 1, device=self.my_device)
+        self.done_buffer = torch.zeros(self.instances, 1, device=self.my_device)
+        self.info_buffer = {"reset": torch.zeros(self.instances, 1, \
+                dtype=torch.bool, device=self.my_device)}
+
+    def reset(self, mask=None):
+        """
+        reset all instances, or only those in a boolean `mask`
+        (see `reset_instances`)
+        """
+
+        if mask is not None:
+            return self.reset_instances(mask)
 
-        self.universe = self.universe.to(self.my_device)
-        observation = self.universe
+        self.close_logs()
+
+        if self.preallocate and (self.universe_buffers is None \
+                or self.universe_buffers[0].shape[0] != self.instances):
+            self.allocate_buffers()
+
+        if self.engine == "bitboard":
+            self.set_packed_universe(self.bitboard.zeros(self.instances))
+        elif self.preallocate:
+            self.universe = self.universe_buffers[0].zero_()
+        else:
+            self.universe = torch.zeros(self.instances, 1, \
+                    self.height, self.width, dtype=self.storage_dtype)\
+                    .to(self.my_device)
+
+        # seeded like instances reset by `reset_instances`
+        if self.alive_rate > 0.0:
+            self.seed_instances(torch.ones(self.instances, \
+                    dtype=torch.bool, device=self.my_device))
+
+        observation = self.get_observation()
 
         self.instance_id = str(int(time.time()))
         self.step_number = 0
 
-        # used to determine when logging universe rle is necessary
-        self.steps_since_action = 0
+        # used to determine when logging universe rle is necessary,
+        # counted per instance and reset when an instance's action toggles
+        # any cell
+        self.steps_since_action = torch.zeros(self.instances, \
+                dtype=torch.int64, device=self.my_device)
+
+        # steps since each instance was last reset
+        self.instance_steps = torch.zeros(self.instances, \
+                dtype=torch.int64, device=self.my_device)
         self.log = []
 
+        if self.logging and self.log_format == "trajectory":
+            self.trajectory = TrajectoryWriter(\
+                    "./logs/carle_trajectory{}.ctrj".format(self.instance_id), \
+                    self.instances, self.height, self.width, \
+                    self.action_height, self.action_width, \
+                    self.keyframe_interval)
+        elif self.logging and self.sink is not None:
+            self.log_file = RotatingFile(\
+                    "./logs/carle_log{}.csv".format(self.instance_id), \
+                    self.max_log_bytes, header="action,universe,\n")
+
         return observation
 
+    def get_instance_mask(self, indices):
+        """
+        boolean mask [instances] from a list or tensor of instance indices,
+        or from a boolean mask
+        """
+
+        if not isinstance(indices, torch.Tensor):
+            indices = torch.tensor(indices) if len(indices) \
+                    else torch.zeros(0, dtype=torch.int64)
+
+        indices = indices.to(self.my_device)
+
+        if indices.dtype == torch.bool:
+            return indices.reshape(-1)
+
+        mask = torch.zeros(self.instances, dtype=torch.bool, \
+                device=self.my_device)
+        mask[indices] = True
+
+        return mask
+
+    def reset_instances(self, indices):
+        """
+        zero (or, with `alive_rate` > 0, reseed) only some instances in place,
+        leaving the others running. The step number, instance id and logs
+        are kept.
+
+            indices - a list or tensor of instance indices, or a boolean mask
+                of shape [instances]
+        """
+
+        mask = self.get_instance_mask(indices)
+
+        self.clear_instances(mask)
+
+        if self.alive_rate > 0.0:
+            self.seed_instances(mask)
+
+        self.instance_steps.masked_fill_(mask, 0)
+        self.steps_since_action.masked_fill_(mask, 0)
+
+        return self.get_observation()
+
+    def seed_instances(self, mask):
+        """
+        replace the universes of instances in a boolean mask with random soups
+        (cells alive with probability `alive_rate`), using only masked ops
+        so that no host synchronization is needed
+        """
+
+        seeds = torch.rand(self.instances, 1, self.height, self.width, \
+                device=self.my_device) < self.alive_rate
+
+        if self.engine == "bitboard":
+            self.set_packed_universe(torch.where(mask.reshape(-1, 1, 1), \
+                    self.bitboard.pack(seeds), self.packed_universe))
+
+            return
+
+        cells = torch.where(mask.reshape(-1, 1, 1, 1), \
+                seeds.to(self.storage_dtype), self.universe)
+
+        if self.engine == "tiles":
+            self.universe.copy_(cells)
+            self._observation = None
+
+            self.active_tiles |= mask.reshape(-1, 1, 1)
+        elif self.preallocate:
+            self.universe.copy_(cells)
+            self._observation = None
+        else:
+            self.universe = cells
+
     def apply_action(self, action):
 
         if not isinstance(action, torch.Tensor):
@@ -155,226 +579,581 @@ class CARLE(nn.Module):
         #action = action[:, :, :self.action_width, :self.action_height]
 
         if action.shape[3] > self.action_width and action.shape[1] < self.width:
-            off_y = (self.width - self.action_width) // 2
-            off_x = (self.height - self.action_height) // 2
-            action_crop = action[:, :, off_y:-off_y, off_x:-off_x]
+            # full-size actions are cropped to the action window
+            left, right, top, bottom = self.action_padding.padding
+            action_crop = action[:, :, top:action.shape[2] - bottom, \
+                    left:action.shape[3] - right]
         else:
             action_crop = action
 
 
-        assert action_crop.shape[2] == self.action_width, \
-                f"action width is wrong {action_crop.shape[2]} not "\
+        assert action_crop.shape[3] == self.action_width, \
+                f"action width is wrong {action_crop.shape[3]} not "\
                 f"{self.action_width}, f{action_crop.shape}"
-        assert action_crop.shape[3] == self.action_height,\
-                f"action height is wrong {action_crop.shape[1]} not "\
+        assert action_crop.shape[2] == self.action_height,\
+                f"action height is wrong {action_crop.shape[2]} not "\
                 f"{self.action_height}, f{action_crop.shape}"
 
+        if (self.preallocate and self.engine == "conv") \
+                or self.engine == "tiles":
+            # toggle cells in the action window, in place
+            left, right, top, bottom = self.action_padding.padding
+
+            window = self.universe[:, :, top:top + action_crop.shape[2], \
+                    left:left + action_crop.shape[3]]
+            action_crop = action_crop.detach().to(self.storage_dtype)
+
+            if self.storage_dtype == torch.float32:
+                window.sub_(action_crop).abs_()
+            else:
+                window.bitwise_xor_(action_crop)
+
+            self._observation = None
+
+            if self.engine == "tiles":
+                # only tiles overlapping the action window are marked
+                self.active_tiles |= self.tiles.mark_window(action_crop, \
+                        top, left)
+
+            return
+
         action_crop = self.action_padding(action_crop)
 
         # toggle cells according to actions
-        self.universe = 1.0 * torch.logical_xor(self.universe, action_crop.detach())
+        if self.engine == "bitboard":
+            self.set_packed_universe(self.packed_universe \
+                    ^ self.bitboard.pack(action_crop.detach()))
+        else:
+            self.universe = torch.logical_xor(self.universe, \
+                    action_crop.detach()).to(self.storage_dtype)
 
 
     def get_observation(self):
+        """
+        float32 copy of the universe, converted at most once per step.
+        Observations don't alias the universe, so they can be kept across
+        steps even when universes are stepped in place, except with the tiles
+        engine and float32 storage: there the observation is the universe
+        itself (which is updated in place, so clone it to keep it), to keep
+        per-step cost proportional to activity.
+        """
+
+        if self._observation is None:
+            # `preallocate` updates universes in place
+            copy = self.preallocate
+
+            self._observation = self.universe.to(torch.float32, copy=copy)
 
-        return self.universe
+        return self._observation
 
 
     def step(self, action):
 
-        # always apply action
-        if torch.sum(action):
-            self.action = action
+        if not isinstance(action, torch.Tensor):
+            action = torch.Tensor(action)
 
-            if self.logging:
-                self.log_universe()
+        self.action = action
 
-            self.apply_action(action)
+        if self.logging:
+            self.log_universe()
 
-        else:
-            self.steps_since_action += 1
-            self.action = action
+        cleared = self.advance(action)
+        expired = self.autoreset()
 
-            if self.logging:
-                self.log_universe()
+        # This environment is open-ended free from exogenous reward,
+        # giving no done signal (unless `max_steps` is set) and a reward of 0.0
+        # episodic constraints and endogenous rewards have to be implemented
+        # by wrappers or agents themselves.
+        observation = self.get_observation()
+        reward, done, info = self.get_step_outputs(cleared, expired)
 
-            self.apply_action(action)
+        return observation, reward, done, info
 
-        if torch.mean(action) == 1.0:
-            """
-            If all toggles are toggled, perform a universe reset.
-            This gives agents a means to 'clear the slate' without relying on
-            external interference i.e. hand-coded resets when an agent is 
-            'stuck.'
-            """
+    def step_async(self, action):
+        """
+        start `step` on a worker thread and return its future (which can be
+        awaited with asyncio.wrap_future). Torch releases the GIL, so e.g. an
+        agent can compute actions for other instances in the meantime.
+        Collect the result with `step_wait`
+        """
+
+        assert self.pending_step is None, "step_wait before the next step_async"
+
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1)
+
+        self.pending_step = self.executor.submit(self.step, action)
+
+        return self.pending_step
+
+    def step_wait(self):
+        """
+        wait for the step started by `step_async`, returning
+        observation, reward, done, info
+        """
+
+        result = self.pending_step.result()
+        self.pending_step = None
+
+        return result
+
+    def advance(self, action):
+        """
+        apply an action and advance one generation, with no host
+        synchronization (no Python branches on tensor values)
+
+        returns a boolean mask of the instances that were cleared
+        """
+
+        if action.device != self.my_device:
+            action = action.to(self.my_device)
+
+        cleared = self.track_action(action)
+
+        self.apply_action(action)
+        self.update_universe()
+
+        """
+        If all toggles are toggled, the instance's universe is cleared.
+        This gives agents a means to 'clear the slate' without relying on
+        external interference i.e. hand-coded resets when an agent is 
+        'stuck.'
+        """
+        self.clear_instances(cleared)
+
+        self.step_number += 1
+        self.instance_steps += 1
+
+        return cleared
+
+    def autoreset(self):
+        """
+        reset instances that have used up `max_steps`, returning their mask
+        (or None without a step budget)
+        """
+
+        if self.max_steps is None:
+            return None
+
+        # masked ops only, so stepping stays free of host synchronization
+        expired = self.instance_steps >= self.max_steps
+        _ = self.reset_instances(expired)
+
+        return expired
+
+    def track_action(self, action):
+        """
+        update per-instance `steps_since_action`, and return the mask of
+        instances whose action toggles every cell
+        """
+
+        # 2D and 3D actions are a single instance, as in `apply_action`
+        while len(action.shape) < 4:
+            action = action.unsqueeze(0)
+
+        flat_action = action.reshape(action.shape[0], -1)
+
+        toggled = (flat_action != 0).any(dim=1).expand(self.instances)
+        cleared = (flat_action.mean(dim=1) == 1.0).expand(self.instances)
+
+        self.steps_since_action.add_(1).masked_fill_(toggled, 0)
+
+        return cleared
+
+    def clear_instances(self, mask):
+        """
+        set the universes of instances in a boolean mask [instances] to zeros
+        """
 
-            observation = self.reset()
+        if self.engine == "bitboard":
+            self.set_packed_universe(self.packed_universe\
+                    .masked_fill(mask.reshape(-1, 1, 1), 0))
+        elif self.engine == "tiles":
+            self.universe.masked_fill_(mask.reshape(-1, 1, 1, 1), 0)
+            self._observation = None
+
+            # cleared universes may come back to life (B0 rules)
+            self.active_tiles |= mask.reshape(-1, 1, 1)
+        elif self.preallocate:
+            self.universe.masked_fill_(mask.reshape(-1, 1, 1, 1), 0)
+            self._observation = None
         else:
+            self.universe = self.universe.masked_fill(\
+                    mask.reshape(-1, 1, 1, 1), 0)
 
-            my_neighborhood = self.neighborhood(self.universe)
+    def get_step_outputs(self, reset=None, done=None):
+        """
+        zero reward, done and info, either newly allocated or (with
+        `preallocate`) the persistent buffers
 
-            birth_grid = reduce(lambda a, b: 1.0 * (a + b), \
-                    [elem == my_neighborhood for elem in self.birth])
-            survive_grid = reduce(lambda a, b: 1.0 * (a + b), \
-                    [elem == my_neighborhood for elem in self.survive])
+            reset - boolean mask of instances cleared this step, for
+                info["reset"]
+            done - boolean mask of instances that reached `max_steps`
+        """
 
-            universe_1 = (1 - self.universe) * birth_grid \
-                    + self.universe * survive_grid
+        if self.preallocate:
+            self.reward_buffer.zero_()
 
-            self.universe = universe_1
-            self.step_number += 1
+            if done is None:
+                self.done_buffer.zero_()
+            else:
+                self.done_buffer.copy_(done.reshape(-1, 1))
 
-            # This environment is open-ended free from exogenous reward,
-            # giving no done signal and a reward of 0.0
-            # episodic constraints and endogenous rewards have to be implemented
-            # by wrappers or agents themselves.
-            observation = self.get_observation()
+            if reset is None:
+                self.info_buffer["reset"].zero_()
+            else:
+                self.info_buffer["reset"].copy_(reset.reshape(-1, 1))
+
+            return self.reward_buffer, self.done_buffer, self.info_buffer
 
         reward = torch.zeros(self.instances, 1).to(self.my_device)
-        done = torch.zeros(self.instances, 1)
+
+        if done is None:
+            done = torch.zeros(self.instances, 1)
+        else:
+            done = done.reshape(-1, 1).to(torch.float32)
+
         info = [{}] * self.instances
 
-        return observation, reward, done, info
+        return reward, done, info
 
-    def render(self):
+    def rollout(self, actions, stride=0):
+        """
+        advance several generations in one call
 
-        os.system("clear")
-        print("\n CA Universe")
+            actions - a [T, instances, 1, action_height, action_width] tensor
+                of actions, one per generation, or an int T to let the
+                universe evolve for T generations without actions
+            stride - if > 0, every `stride`-th observation is returned as a
+                [T // stride, instances, 1, height, width] tensor of frames,
+                otherwise only the final observation is returned
 
-        for ii in range(self.universe.shape[2]):
-            print("")
-            for jj in range(self.universe.shape[3]):
-                if self.universe[0,0,ii,jj]:
-                    print("o", end="")
-                else:
-                    print(" ", end="")
+        returns observation (or frames), reward summed over T, done, info
+        """
 
-        time.sleep(0.125)
-                #print(self.universe[0,0,ii,jj], end="\r")
+        if isinstance(actions, int):
+            generations = actions
+            actions = None
+        else:
+            if not isinstance(actions, torch.Tensor):
+                actions = torch.Tensor(actions)
 
-    def rle_to_grid(self, rle):
+            generations = actions.shape[0]
 
-        ii = 0
-        jj = 0
+        assert 0 <= stride <= generations, \
+                f"stride {stride} must be between 0 and {generations} generations"
 
-        line_count = 0
-        total_count = 0
-        rle_length = len(rle)
+        if self.logging and actions is None:
+            actions = torch.zeros(generations, self.instances, 1, \
+                    self.action_height, self.action_width)
 
-        my_grid = torch.zeros(self.height, self.width)
+        # instances that reached `max_steps` at any point in the rollout
+        done = None
 
-        temp = ""
-        while total_count < rle_length:
+        frames = []
+        for tt in range(generations):
 
-            temp += rle[total_count]
+            if self.logging:
+                # logs are kept per generation, so take single steps
+                _, _, step_done, _ = self.step(actions[tt])
 
-            if temp[-1] == "\n":
-                temp = temp[:-1]
+                expired = None if self.max_steps is None \
+                        else (step_done.reshape(-1) != 0).to(self.my_device)
             else:
+                if actions is None:
+                    self.steps_since_action += 1
+                    self.instance_steps += 1
+                    self.update_universe()
+                    self.step_number += 1
+                else:
+                    self.action = actions[tt]
+                    _ = self.advance(actions[tt])
 
-                if temp[-1].lower() == "b":
+                expired = self.autoreset()
 
-                    if temp == "b":
-                        run = 1
-                    else:
-                        run = int(temp[:-1])
+            if expired is not None:
+                done = expired if done is None else done | expired
 
-                    my_grid[ii,jj:jj+run] = 0
+            if stride and (tt + 1) % stride == 0:
+                frames.append(self.get_observation().clone())
 
-                    jj += run
-                    temp = ""
+        if stride:
+            observation = torch.stack(frames)
+        else:
+            observation = self.get_observation()
 
-                elif temp[-1].lower() == "o":
+        reward, done, info = self.get_step_outputs(done=done)
 
-                    if temp == "o":
-                        run = 1
-                    else:
-                        run = int(temp[:-1])
+        return observation, reward, done, info
 
-                    my_grid[ii,jj:jj+run] = 1
+    def fast_forward(self, generations):
+        """
+        let all instances evolve for `generations` steps without actions,
+        using HashLife. Long-horizon behavior of sparse or repetitive
+        patterns (gliders, guns, puffers) costs a small fraction of stepping.
 
-                    jj += run
-                    temp = ""
+        Height and width must be powers of 2, otherwise this falls back to
+        `rollout`. Returns the same (observation, reward, done, info) as `step`.
+        """
 
-                elif temp[-1] == "$":
+        height_ok = self.height >= 4 and (self.height & (self.height - 1)) == 0
+        width_ok = self.width >= 4 and (self.width & (self.width - 1)) == 0
 
-                    if len(temp) > 1:
-                        row_run = int(temp[:-1])
+        if not (height_ok and width_ok) or self.logging:
+            return self.rollout(generations)
 
-                        # +1 so that current row doesn't get overwritten
-                        my_grid[ii+1:ii+row_run,:] = 0
+        self.refresh_rules()
 
-                        ii += row_run
-                    else:
-                        my_grid[ii,jj:] = 0
+        universe = self.universe.detach().cpu().numpy()
+        universe_1 = np.zeros(universe.shape, dtype=np.uint8)
 
-                        # advance to next row
-                        ii += 1
+        for ii in range(universe.shape[0]):
 
+            rule_string = self.get_rule_string(ii)
 
-                    jj = 0
-                    temp = ""
+            if rule_string not in self.hashlife_engines:
+                birth, survive = self.split_rule_string(rule_string)
+                self.hashlife_engines[rule_string] = HashLife(birth, survive, \
+                        max_nodes=self.hashlife_nodes)
 
-                elif temp[-1] == "!":
-                    temp = ""
+            universe_1[ii, 0] = self.hashlife_engines[rule_string]\
+                    .advance(universe[ii, 0], generations)
 
-            total_count += 1
+        self.universe = torch.tensor(universe_1).to(self.storage_dtype)\
+                .to(self.my_device)
 
-        return my_grid
+        self.step_number += generations
+        self.steps_since_action += generations
+        self.instance_steps += generations
 
-    def read_rle(self, filepath):
+        # instances past their `max_steps` are reset at the end
+        expired = self.autoreset()
 
-        rle = ""
+        observation = self.get_observation()
+        reward, done, info = self.get_step_outputs(done=expired)
 
-        add_to_rle = False
-        with open(filepath, "r") as f:
+        return observation, reward, done, info
 
-            for temp_line in f.readlines():
+    def refresh_rules(self):
+        """
+        birth and survive may have been assigned directly (e.g. in train_mcl),
+        which replaces any per-instance rules
+        """
 
-                if add_to_rle:
+        if self.get_rule_string() != self.rule_string:
+            self.instance_rules = None
+            self.update_rule_table()
 
-                    rle += temp_line
+    def update_universe(self):
+        """
+        advance all universes by one generation according to the B/S rules
+        """
 
-                if "rule" in temp_line:
+        self.refresh_rules()
 
-                    rules = temp_line.split("/")
+        if self.engine == "bitboard":
+            self.set_packed_universe(self.bitboard.step(self.packed_universe, \
+                    self.rule_masks))
 
-                    proto_birth = rules[0].split()[-1]
+            return
+        elif self.engine == "tiles":
+            self.active_tiles = self.tiles.step(self.universe, \
+                    self.active_tiles, self.rule_table, self.rule_offsets)
+            self._observation = None
 
-                    if ":" in rules:
-                        # assuming the rle includes dimensions
-                        # (i.e. has a colon) for now
-                        proto_survive_dim = rules[1].split(":")
+            return
+        elif self.preallocate:
+            self.update_universe_in_place()
 
-                        proto_survive = proto_survive_dim[0]
-                        proto_dim = proto_survive_dim[1]
-                    else:
-                        proto_survive = rules[-1]
-                        proto_dim = None
+            return
+        elif self.compile:
+            self.universe = self.get_compiled_step()(self.universe, \
+                    self.storage_rule_table, self.rule_offsets)
 
+            return
 
-                    self.birth = []
-                    self.survive = []
+        if self.storage_dtype == torch.float32:
 
-                    for bb in proto_birth:
-                        if bb.lower() != "b":
-                            self.birth.append(int(bb))
-                    for ss in proto_survive:
-                        if ss.lower() != "s" and ss.lower() != '\n':
-                            self.survive.append(int(ss))
+            my_neighborhood = self.neighborhood(self.universe)
 
-                    self.birth = list(set(self.birth))
-                    self.survive = list(set(self.survive))
+            # a single gather applies the rule, whatever the number of B/S digits
+            rule_index = (9 * self.universe + my_neighborhood).long()
 
-                    self.birth.sort()
-                    self.survive.sort()
+            if self.rule_offsets is not None:
+                rule_index += self.rule_offsets
 
-                    # ignore dimensions (and corner) for now (assuming rle files come from CARLE)
+            self.universe = torch.take(self.rule_table, rule_index)
+        else:
 
-                    # set
-                    add_to_rle = True
+            cells = self.universe.to(torch.uint8)
+            rule_index = 9 * cells + self.count_neighbors(cells)
 
-        return rle
+            # look up next states in the bit-packed rule table
+            universe_1 = (self.rule_bits >> rule_index) & 1
+
+            self.universe = universe_1.to(self.storage_dtype)
+
+    def get_compiled_step(self):
+        """
+        compiled `fused_step` for the current rule table, or the eager
+        function if compilation isn't available
+        """
+
+        if not hasattr(torch, "compile"):
+            return fused_step
+
+        key = (tuple(self.storage_rule_table.shape), self.storage_dtype, \
+                self.rule_offsets is not None)
+
+        if key not in self.compiled_steps:
+            compiled = torch.compile(fused_step, dynamic=False)
+
+            try:
+                # compile now, so that failures fall back to eager
+                _ = compiled(self.universe, self.storage_rule_table, \
+                        self.rule_offsets)
+            except Exception as error:
+                print(f"warning, torch.compile failed ({error}), "\
+                        "using eager fused_step")
+                compiled = fused_step
+
+            self.compiled_steps[key] = compiled
+
+        return self.compiled_steps[key]
+
+    def update_universe_in_place(self):
+        """
+        advance one generation into the spare universe buffer, using only
+        persistent buffers
+        """
+
+        universe = self.universe
+
+        if universe is self.universe_buffers[0]:
+            universe_1 = self.universe_buffers[1]
+        else:
+            universe_1 = self.universe_buffers[0]
+
+        # circular padding, the column copies fill in the corners
+        padded = self.padded_buffer
+        padded[:, :, 1:-1, 1:-1].copy_(universe)
+        padded[:, :, 0, 1:-1].copy_(universe[:, :, -1])
+        padded[:, :, -1, 1:-1].copy_(universe[:, :, 0])
+        padded[:, :, :, 0].copy_(padded[:, :, :, -2])
+        padded[:, :, :, -1].copy_(padded[:, :, :, 1])
+
+        rule_index = self.index_buffer
+        torch.add(self.neighbor_views[0], self.neighbor_views[1], out=rule_index)
+
+        for view in self.neighbor_views[2:]:
+            rule_index.add_(view)
+
+        rule_index.add_(padded[:, :, 1:-1, 1:-1], alpha=9)
+
+        if self.rule_offsets is not None:
+            rule_index.add_(self.rule_offsets)
+
+        torch.index_select(self.storage_rule_table, 0, rule_index.view(-1), \
+                out=universe_1.view(-1))
+
+        self.universe = universe_1
+
+    def count_neighbors(self, cells):
+        """
+        Moore neighborhood sums on a torus using integer arithmetic,
+        expects a uint8 universe
+        """
+
+        row_sum = cells + torch.roll(cells, 1, dims=-1) \
+                + torch.roll(cells, -1, dims=-1)
+        block_sum = row_sum + torch.roll(row_sum, 1, dims=-2) \
+                + torch.roll(row_sum, -1, dims=-2)
+
+        return block_sum - cells
+
+    def render(self, **kwargs):
+        """
+        draw the universe in the terminal, keyword arguments (e.g. mode,
+        instances, viewport, downsample, fps) configure the renderer,
+        see carle.terminal.TerminalRenderer. Calls without keyword
+        arguments, or with the same ones, keep the current renderer
+        """
+
+        if self.renderer is None \
+                or (len(kwargs) and kwargs != self.renderer_kwargs):
+            self.renderer = TerminalRenderer(**kwargs)
+            self.renderer_kwargs = kwargs
+
+        self.renderer.render(self.universe, \
+                " CA Universe, step {}".format(self.step_number))
+
+    def place_pattern(self, grid, cells, offset=None, position=None):
+        """
+        write a decoded pattern (2D numpy array) into a numpy universe grid,
+        wrapping around the torus
+
+            offset - (row, col) of the pattern's top-left corner, "center" to
+                center it, or "file" to use the rle's own position. 
+                Default (0, 0)
+        """
+
+        assert cells.shape[0] <= self.height and cells.shape[1] <= self.width, \
+                f"pattern {cells.shape} doesn't fit in the universe"
+
+        if offset is None:
+            offset = (0, 0)
+        elif offset == "center":
+            offset = ((self.height - cells.shape[0]) // 2, \
+                    (self.width - cells.shape[1]) // 2)
+        elif offset == "file":
+            offset = (0, 0) if position is None else position
+
+        rows = (offset[0] + np.arange(cells.shape[0])) % self.height
+        cols = (offset[1] + np.arange(cells.shape[1])) % self.width
+
+        grid[np.ix_(rows, cols)] = cells
+
+        return grid
+
+    def rle_to_grid(self, rle, offset=None):
+
+        cells, info = decode_rle(rle)
+
+        my_grid = np.zeros((self.height, self.width), dtype=np.uint8)
+        my_grid = self.place_pattern(my_grid, cells, offset, info["position"])
+
+        return torch.tensor(my_grid, dtype=torch.float32)
+
+    def read_rle_file(self, filepath):
+        """
+        read and decode an rle file, cached until the file is modified
+
+        returns decoded cells and header info (see carle.rle.decode_rle)
+        """
+
+        modified = os.path.getmtime(filepath)
+
+        if filepath not in self.rle_files \
+                or self.rle_files[filepath][0] != modified:
+
+            with open(filepath, "r") as f:
+                cells, info = decode_rle(f.read())
+
+            self.rle_files[filepath] = (modified, cells, info)
+
+        return self.rle_files[filepath][1:]
+
+    def read_rle(self, filepath):
+        """
+        read the pattern part of an rle file and set the rules from its header
+        """
+
+        cells, info = self.read_rle_file(filepath)
+
+        if info["rule"] is not None:
+            self.rules_from_string(info["rule"])
+
+        return info["body"]
 
     def read_csv(self, filepath):
 
@@ -398,85 +1177,185 @@ class CARLE(nn.Module):
                 and self.universe.shape[3] == my_universe.shape[1],\
                 "tried to load the wrong size universe"
 
-        self.universe[universe_index,0,:,:] = my_universe
+        universe = self.universe
+        universe[universe_index,0,:,:] = my_universe
 
-    def get_rle(self, universe, action=False):
+        # re-assign so that packed engines see the loaded pattern
+        self.universe = universe
 
+    def load_universe_batch(self, paths_or_rles, indices=None, offsets=None):
         """
-        compute run-length encoding for given universe
-        expects one 2D CA universe
+        seed many instances from rle files or rle strings in one tensor write
+
+            paths_or_rles - a list of rle file paths and/or rle text
+            indices - instances to fill, default 0, 1, ... len(paths_or_rles)-1
+            offsets - placement of each pattern, see `place_pattern`. Either
+                one offset for all patterns or a list with one per pattern
+
+        Rules in the rle headers are ignored, use `rules_from_string` to set
+        them (e.g. a list of rule strings for per-instance rules)
         """
 
-        universe = universe.squeeze()
+        if indices is None:
+            indices = list(range(len(paths_or_rles)))
+
+        if offsets is None or isinstance(offsets, str) \
+                or not isinstance(offsets[0], (list, tuple, str)):
+            offsets = [offsets] * len(paths_or_rles)
+
+        grids = np.zeros((len(paths_or_rles), self.height, self.width), \
+                dtype=np.uint8)
+
+        for kk, path_or_rle in enumerate(paths_or_rles):
+
+            if "\n" not in path_or_rle and os.path.isfile(path_or_rle):
+                cells, info = self.read_rle_file(path_or_rle)
+            else:
+                cells, info = decode_rle(path_or_rle)
+
+            self.place_pattern(grids[kk], cells, offsets[kk], info["position"])
+
+        universe = self.universe
+        universe[indices, 0] = torch.tensor(grids).to(universe.dtype)\
+                .to(universe.device)
+
+        self.universe = universe
+
+    def get_rle_header(self, action=False, rule_string=None, step_number=None):
+
+        if rule_string is None:
+            rule_string = self.get_rule_string()
+
+        if step_number is None:
+            step_number = self.step_number
 
-        #write header
         rle = "#C exp_id={} \n".format(self.instance_id)
         if action:
-            rle += "#C step={} (action) \n".format(self.step_number)
+            rle += "#C step={} (action) \n".format(step_number)
         else:
-            rle += "#C step={} (universe) \n".format(self.step_number)
+            rle += "#C step={} (universe) \n".format(step_number)
 
-        rle += "x = 0, y = 0, rule = B"
-        for bb in self.birth: rle += str(bb)
-        rle += "/S"
-        for ss in self.survive: rle += str(ss)
+        rle += "x = 0, y = 0, rule = {}".format(rule_string)
         rle += ":T{}, {}\n".format(self.height, self.width)
 
-        state_string = ["b", "o"]
-
-        run_length = ""
-        for ii in range(universe.shape[0]):
-            jj = 0
-            current_state = universe[ii, jj]
-            run_count = 1
-            while jj < universe.shape[1] - 1:
-
-                jj +=1
-
-                if universe[ii, jj] == current_state:
-                    run_count += 1
-                else:
+        return rle
 
-                    run_length += str(run_count) + state_string[int(current_state)]
+    def get_rle(self, universe, action=False, rule_string=None, \
+            step_number=None):
 
-                    if len(run_length) > 69:
-                        rle +=  run_length + "\n"
-                        run_length = ""
+        """
+        compute run-length encoding for given universe
+        expects one 2D CA universe
+        """
 
-                    current_state = universe[ii,jj]
-                    run_count = 1
+        universe = universe.squeeze().detach().cpu().numpy()
 
+        tokens = run_tokens(universe.reshape(1, *universe.shape))[0]
 
-            run_length += str(run_count) + state_string[int(current_state)]
-            run_length += "$"
-            if len(run_length) > 69:
-                rle +=  run_length + "\n"
-                run_length = ""
+        rle = self.get_rle_header(action, rule_string, step_number)
+        rle += wrap_tokens(tokens)
 
         # end of pattern signal
         rle += "!"
 
         return rle
 
+    def get_rle_batch(self, universe=None, action=False):
+        """
+        run-length encode every instance (of `universe`, default the current
+        universe) in one call, returning a list of rle strings
+        """
+
+        if universe is None:
+            universe = self.universe
+
+        universe = universe.detach().cpu().numpy()
+        universe = universe.reshape(universe.shape[0], \
+                universe.shape[-2], universe.shape[-1])
+
+        rle_batch = []
+        for ii, tokens in enumerate(run_tokens(universe)):
+
+            rle = self.get_rle_header(action, \
+                    None if action else self.get_rule_string(ii))
+            rle += wrap_tokens(tokens)
+            rle += "!"
+
+            rle_batch.append(rle)
+
+        return rle_batch
 
     def log_universe(self, universe_index=0):
         """
         save universe rle to log list
         [[action, rle]
         ]
+        or append all instances to the trajectory file
         """
 
-        rle_universe = self.get_rle(self.universe[universe_index,0,:,:])
-        rle_action = self.get_rle(self.action[universe_index,0,:,:], action=True)
+        if self.log_format == "trajectory":
+            self.submit(self.trajectory.append, self.snapshot(self.universe), \
+                    self.snapshot(self.action), self.step_number)
 
-        self.log.append([rle_action, rle_universe])
+            return
+
+        self.submit(self.write_log_entry, \
+                self.snapshot(self.universe[universe_index,0,:,:]), \
+                self.snapshot(self.action[universe_index,0,:,:]), \
+                self.get_rule_string(), self.step_number)
+
+    def write_log_entry(self, universe, action, rule_string, step_number):
+
+        rle_universe = self.get_rle(universe, rule_string=rule_string, \
+                step_number=step_number)
+        rle_action = self.get_rle(action, action=True, \
+                rule_string=rule_string, step_number=step_number)
+
+        if self.log_file is not None:
+            self.log_file.write('"' + rle_action + '","' + rle_universe + '",\n')
+        else:
+            self.log.append([rle_action, rle_universe])
+
+    def snapshot(self, tensor):
+        """
+        copy a tensor that is about to be handed to the I/O worker
+        (universes may be updated in place by the next step)
+        """
+
+        if self.sink is None:
+            return tensor
+
+        return tensor.detach().clone()
+
+    def submit(self, function, *args):
+        """
+        run a write on the I/O worker with `async_io`, otherwise right away
+        """
+
+        if self.sink is None:
+            function(*args)
+        else:
+            self.sink.put(function, *args)
 
 
     def save_log(self):
         """
-        save log as csv file
+        save log as csv file, or flush the trajectory or streamed csv file
+        (the trajectory index is written by `close`)
         """
 
+        if self.sink is not None:
+            self.sink.flush()
+
+        if self.log_format == "trajectory":
+            self.trajectory.flush()
+
+            return
+        elif self.log_file is not None:
+            self.log_file.flush()
+
+            return
+
         with open("./logs/carle_log{}.csv".format(self.instance_id), "w") as f:
 
             f.write('action,universe,\n')
@@ -486,14 +1365,44 @@ class CARLE(nn.Module):
                     f.write('"' + entry + '"' + ",")
                 f.write("\n")
 
+    def close_logs(self):
+        """
+        finish pending writes and the trajectory or streamed log file
+        """
+
+        if self.sink is not None:
+            self.sink.flush()
+
+        if self.trajectory is not None:
+            self.trajectory.close()
+            self.trajectory = None
+
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+    def close(self):
+        """
+        finish all logs and stop the I/O worker
+        """
+
+        self.close_logs()
+
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
 
 
     def save_rle(self, rle):
 
-        with open("./logs/universe{}_step{}.rle"\
-                .format(self.instance_id, self.step_number), "w") as f:
+        self.submit(self.write_text, "./logs/universe{}_step{}.rle"\
+                .format(self.instance_id, self.step_number), rle)
+
+    def write_text(self, filepath, text):
 
-            f.write(rle)
+        with open(filepath, "w") as f:
+
+            f.write(text)
 
 
 
@@ -504,9 +1413,14 @@ class CARLE(nn.Module):
         """
 
 
-        skimage.io.imsave("./frames/frame{}_step{}.png"\
+        self.submit(self.write_frame, "./frames/frame{}_step{}.png"\
                 .format(self.instance_id, self.step_number), \
-                np.uint8(255 * self.universe[0,0,:,:].detach().cpu().numpy()))
+                self.snapshot(self.universe[0,0,:,:]))
+
+    def write_frame(self, filepath, frame):
+
+        skimage.io.imsave(filepath, \
+                np.uint8(255 * frame.detach().cpu().numpy().astype(np.float32)))
 
 
 
@@ -551,23 +1465,4 @@ if __name__ == '__main__':
     print("CA updates per second with {}x vectorization = {} and saving frames"\
             .format(env.instances, my_steps * env.instances/(t1-t0)))
 
-    if(0):
-
-
-        for instances in [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096]:
-            action = torch.ones(env.instances,1,32,32)
-            env.instances = instances
-            obs = env.reset()
-            t2 = time.time()
-
-            for step in range(my_steps):
-                _ = env.step(action)
-
-
-            t3 = time.time()
-            print("CA updates per second with {}x vectorization = {}"\
-                    .format(env.instances, my_steps * env.instances/(t3-t2)))
-
-
-
-
+    # for throughput benchmarks, see carle/benchmark.py
@@ -0,0 +1,282 @@
+"""
+HashLife (Gosper 1984) for fast-forwarding Life-like CA on a torus
+
+    Universes are stored as canonical (hash-consed) quadtrees, and the
+    successor of each node is memoized, so repetitive and sparse patterns
+    (gliders, guns, puffers, still lifes) can be advanced 2^k generations at
+    a cost that depends on the pattern's structure, not on the grid area.
+
+    A torus of size 2^n is handled as an infinite periodic plane: the 2x2 tiling
+    of the torus node is advanced, and the centered result is the torus shifted
+    by half its size, which is undone by swapping diagonal quadrants.
+"""
+
+import numpy as np
+
+
+class CacheFull(Exception):
+    """
+    raised by `HashLife.successor` when the caches outgrow `max_nodes`
+    """
+
+class Node():
+
+    __slots__ = ["level", "a", "b", "c", "d", "population"]
+
+    def __init__(self, level, a=None, b=None, c=None, d=None, population=0):
+        """
+        quadtree node covering 2^level x 2^level cells,
+        with quadrants a (nw), b (ne), c (sw), d (se)
+        """
+
+        self.level = level
+        self.a = a
+        self.b = b
+        self.c = c
+        self.d = d
+        self.population = population
+
+class HashLife():
+
+    def __init__(self, birth=[3], survive=[2,3], max_nodes=2**20):
+
+        self.birth = set(birth)
+        self.survive = set(survive)
+
+        # nodes + memoized successors kept before the caches are cleared,
+        # enforced within each jump by `successor`
+        self.max_nodes = max_nodes
+        self.limit_cache = True
+
+        self.off = Node(0, population=0)
+        self.on = Node(0, population=1)
+
+        self.clear_cache()
+
+    def clear_cache(self):
+        """
+        evict all canonical nodes and memoized successors
+        """
+
+        self.nodes = {}
+        self.successors = {}
+        self.empty_nodes = [self.off]
+
+    def cache_size(self):
+
+        return len(self.nodes) + len(self.successors)
+
+    def join(self, a, b, c, d):
+
+        key = (a, b, c, d)
+
+        node = self.nodes.get(key)
+
+        if node is None:
+            node = Node(a.level + 1, a, b, c, d, \
+                    a.population + b.population + c.population + d.population)
+            self.nodes[key] = node
+
+        return node
+
+    def get_empty(self, level):
+
+        while len(self.empty_nodes) <= level:
+            empty = self.empty_nodes[-1]
+            self.empty_nodes.append(self.join(empty, empty, empty, empty))
+
+        return self.empty_nodes[level]
+
+    def next_state(self, alive, neighbors):
+
+        if alive:
+            return self.on if neighbors in self.survive else self.off
+        else:
+            return self.on if neighbors in self.birth else self.off
+
+    def life_4x4(self, node):
+        """
+        base case: the center 2x2 of a 4x4 node, one generation later
+        """
+
+        rows = [[node.a.a, node.a.b, node.b.a, node.b.b], \
+                [node.a.c, node.a.d, node.b.c, node.b.d], \
+                [node.c.a, node.c.b, node.d.a, node.d.b], \
+                [node.c.c, node.c.d, node.d.c, node.d.d]]
+
+        cells = [[cell.population for cell in row] for row in rows]
+
+        center = []
+        for ii in [1, 2]:
+            for jj in [1, 2]:
+                neighbors = sum([sum(cells[ii + di][jj - 1:jj + 2]) \
+                        for di in [-1, 0, 1]]) - cells[ii][jj]
+
+                center.append(self.next_state(cells[ii][jj], neighbors))
+
+        return self.join(*center)
+
+    def successor(self, node, step_level):
+        """
+        the center 2^(level-1) square of `node`, 2^step_level generations later
+        (step_level is capped at node.level - 2)
+        """
+
+        step_level = min(step_level, node.level - 2)
+        key = (node, step_level)
+
+        result = self.successors.get(key)
+
+        if result is not None:
+            return result
+
+        if self.limit_cache and self.cache_size() > self.max_nodes:
+            raise CacheFull()
+
+        if node.population == 0 and 0 not in self.birth:
+            result = self.get_empty(node.level - 1)
+        elif node.level == 2:
+            result = self.life_4x4(node)
+        else:
+            a, b, c, d = node.a, node.b, node.c, node.d
+
+            c1 = self.successor(self.join(a.a, a.b, a.c, a.d), step_level)
+            c2 = self.successor(self.join(a.b, b.a, a.d, b.c), step_level)
+            c3 = self.successor(self.join(b.a, b.b, b.c, b.d), step_level)
+            c4 = self.successor(self.join(a.c, a.d, c.a, c.b), step_level)
+            c5 = self.successor(self.join(a.d, b.c, c.b, d.a), step_level)
+            c6 = self.successor(self.join(b.c, b.d, d.a, d.b), step_level)
+            c7 = self.successor(self.join(c.a, c.b, c.c, c.d), step_level)
+            c8 = self.successor(self.join(c.b, d.a, c.d, d.c), step_level)
+            c9 = self.successor(self.join(d.a, d.b, d.c, d.d), step_level)
+
+            if step_level < node.level - 2:
+                # the nine sub-results are already far enough in the future,
+                # only the center of each is kept
+                result = self.join(\
+                        self.join(c1.d, c2.c, c4.b, c5.a), \
+                        self.join(c2.d, c3.c, c5.b, c6.a), \
+                        self.join(c4.d, c5.c, c7.b, c8.a), \
+                        self.join(c5.d, c6.c, c8.b, c9.a))
+            else:
+                result = self.join(\
+                        self.successor(self.join(c1, c2, c4, c5), step_level), \
+                        self.successor(self.join(c2, c3, c5, c6), step_level), \
+                        self.successor(self.join(c4, c5, c7, c8), step_level), \
+                        self.successor(self.join(c5, c6, c8, c9), step_level))
+
+        self.successors[key] = result
+
+        return result
+
+    def from_array(self, cells, top=0, left=0, size=None):
+        """
+        build a quadtree from a square 2D array with a power of 2 side length
+        """
+
+        if size is None:
+            size = cells.shape[0]
+
+        if size == 1:
+            return self.on if cells[top, left] else self.off
+
+        level = size.bit_length() - 1
+
+        if not cells[top:top + size, left:left + size].any():
+            return self.get_empty(level)
+
+        half = size // 2
+
+        return self.join(\
+                self.from_array(cells, top, left, half), \
+                self.from_array(cells, top, left + half, half), \
+                self.from_array(cells, top + half, left, half), \
+                self.from_array(cells, top + half, left + half, half))
+
+    def to_array(self, node, cells=None, top=0, left=0):
+
+        if cells is None:
+            size = 2**node.level
+            cells = np.zeros((size, size), dtype=np.uint8)
+
+        if node.population == 0:
+            return cells
+
+        if node.level == 0:
+            cells[top, left] = 1
+
+            return cells
+
+        half = 2**(node.level - 1)
+
+        self.to_array(node.a, cells, top, left)
+        self.to_array(node.b, cells, top, left + half)
+        self.to_array(node.c, cells, top + half, left)
+        self.to_array(node.d, cells, top + half, left + half)
+
+        return cells
+
+    def jump(self, torus, step_level):
+        """
+        advance a torus node by 2^step_level generations
+        """
+
+        plane = self.join(torus, torus, torus, torus)
+        shifted = self.successor(plane, step_level)
+
+        # undo the half-size shift of the centered result
+        return self.join(shifted.d, shifted.c, shifted.b, shifted.a)
+
+    def advance(self, cells, generations):
+        """
+        advance a 2D toroidal universe (height and width powers of 2, at least 4)
+        by `generations` steps, returning a uint8 array of the same shape
+        """
+
+        # e.g. numpy integers
+        generations = int(generations)
+
+        height, width = cells.shape
+        size = max(height, width)
+
+        assert size >= 4 and (height & (height - 1)) == 0 \
+                and (width & (width - 1)) == 0, \
+                f"HashLife needs power of 2 dimensions, got {cells.shape}"
+
+        # a periodic universe is also periodic on the larger square torus
+        square = np.tile(cells != 0, (size // height, size // width))
+
+        torus = self.from_array(square)
+        max_step_level = torus.level - 1
+
+        while generations > 0:
+
+            # nodes still referenced (e.g. `torus`) stay valid after eviction,
+            # they just stop being shared
+            if self.cache_size() > self.max_nodes:
+                self.clear_cache()
+
+            step_level = min(generations.bit_length() - 1, max_step_level)
+
+            try:
+                torus = self.jump(torus, step_level)
+            except CacheFull:
+                # the jump outgrew the cache: evict it, and retry with
+                # smaller jumps (which need fewer nodes)
+                self.clear_cache()
+
+                if step_level > 0:
+                    max_step_level = step_level - 1
+
+                    continue
+
+                # a single generation always completes
+                self.limit_cache = False
+                try:
+                    torus = self.jump(torus, step_level)
+                finally:
+                    self.limit_cache = True
+
+            generations -= 2**step_level
+
+        return self.to_array(torus)[:height, :width]
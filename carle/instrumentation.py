@@ -0,0 +1,169 @@
+"""
+per-layer timing for CARLE wrapper chains
+
+    StepTimer replaces `step` on each layer of a Motivator chain (and the inner
+    CARLE) with a timed version, stored as an instance attribute so that
+    removing it restores the class method with no remaining overhead.
+    Inclusive time covers a layer and everything it calls, exclusive time
+    only the layer's own work.
+"""
+
+import collections
+import json
+import time
+
+import torch
+
+
+class StepTimer():
+
+    def __init__(self, env, **kwargs):
+        """
+            env - outermost layer of a wrapper chain (or a bare CARLE)
+            profile - also mark each layer's step as a torch.profiler
+                record_function range, default False
+            window - outer steps in the rolling steps/sec gauge, default 100
+            dump_path - append a JSON report to this file every
+                `dump_interval` seconds, default None (no dumps)
+            dump_interval - seconds between dumps, default 60
+        """
+
+        self.profile = kwargs.get("profile", False)
+        self.window = kwargs.get("window", 100)
+        self.dump_path = kwargs.get("dump_path", None)
+        self.dump_interval = kwargs.get("dump_interval", 60.0)
+
+        self.layers = []
+
+        layer = env
+        while layer is not None:
+            self.layers.append(layer)
+            layer = getattr(layer, "env", None)
+
+        # the inner CARLE isn't reached through .env by every chain
+        inner_env = getattr(env, "inner_env", None)
+        if inner_env is not None and inner_env not in self.layers:
+            self.layers.append(inner_env)
+
+        self.names = []
+        for index, layer in enumerate(self.layers):
+            name = getattr(layer, "my_name", type(layer).__name__)
+            self.names.append("{}:{}".format(index, name))
+
+        self.instances = self.layers[-1].instances
+
+        self.reset_counts()
+
+    def reset_counts(self):
+
+        self.calls = {name: 0 for name in self.names}
+        self.inclusive = {name: 0.0 for name in self.names}
+        self.exclusive = {name: 0.0 for name in self.names}
+
+        # time spent in nested layers, one entry per layer on the call stack
+        self.child_time = []
+        self.step_times = collections.deque(maxlen=self.window)
+        self.last_dump = time.perf_counter()
+
+    def enable(self):
+
+        for layer, name in zip(self.layers, self.names):
+            layer.step = self.timed(layer, name)
+
+    def disable(self):
+
+        for layer in self.layers:
+            if "step" in layer.__dict__:
+                del layer.step
+
+    def timed(self, layer, name):
+
+        step = type(layer).step.__get__(layer)
+
+        def timed_step(action):
+
+            self.child_time.append(0.0)
+
+            t0 = time.perf_counter()
+
+            if self.profile:
+                with torch.profiler.record_function(name):
+                    result = step(action)
+            else:
+                result = step(action)
+
+            t1 = time.perf_counter()
+            elapsed = t1 - t0
+
+            self.calls[name] += 1
+            self.inclusive[name] += elapsed
+            self.exclusive[name] += elapsed - self.child_time.pop()
+
+            if len(self.child_time):
+                self.child_time[-1] += elapsed
+            else:
+                # an outermost step
+                self.step_times.append(t1)
+
+                if self.dump_path is not None \
+                        and t1 - self.last_dump >= self.dump_interval:
+                    self.dump()
+
+            return result
+
+        return timed_step
+
+    def steps_per_second(self):
+        """
+        rolling rate of outer steps (multiply by instances for
+        instance-steps)
+        """
+
+        if len(self.step_times) < 2:
+            return 0.0
+
+        return (len(self.step_times) - 1) \
+                / (self.step_times[-1] - self.step_times[0])
+
+    def report(self):
+
+        layers = {}
+        for name in self.names:
+            calls = self.calls[name]
+
+            layers[name] = {"calls": calls, \
+                    "inclusive": self.inclusive[name], \
+                    "exclusive": self.exclusive[name], \
+                    "mean_inclusive": self.inclusive[name] / max(calls, 1)}
+
+        steps_per_second = self.steps_per_second()
+
+        return {"time": time.time(), "layers": layers, \
+                "steps_per_second": steps_per_second, \
+                "instance_steps_per_second": steps_per_second * self.instances}
+
+    def dump(self):
+
+        with open(self.dump_path, "a") as f:
+            f.write(json.dumps(self.report()) + "\n")
+
+        self.last_dump = time.perf_counter()
+
+    def summary(self):
+        """
+        per-layer breakdown as text, outermost layer first
+        """
+
+        total = max(sum(self.exclusive.values()), 1e-12)
+
+        lines = ["{:<24} {:>8} {:>12} {:>12} {:>7}".format(\
+                "layer", "calls", "inclusive s", "exclusive s", "share")]
+
+        for name in self.names:
+            lines.append("{:<24} {:>8} {:>12.4f} {:>12.4f} {:>6.1f}%".format(\
+                    name, self.calls[name], self.inclusive[name], \
+                    self.exclusive[name], 100 * self.exclusive[name] / total))
+
+        lines.append("steps / second = {:.3f}".format(self.steps_per_second()))
+
+        return "\n".join(lines)
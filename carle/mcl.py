@@ -14,6 +14,8 @@ endogenous reward system for open-ended learning.
 import os
 
 import time
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 
 import torch
@@ -22,10 +24,20 @@ import torch.nn.functional as F
 
 import carle
 from carle.env import CARLE
+from carle.instrumentation import StepTimer
 
 import matplotlib.pyplot as plt
 
 
+def get_stats(obs, weights):
+    """
+    per-instance weighted sums of the observation, [instances, k] for weight
+    columns [height * width, k]
+    """
+
+    return torch.matmul(obs.reshape(obs.shape[0], -1).to(weights.dtype), \
+            weights)
+
 class Motivator(nn.Module):
 
     def __init__(self, env, **kwargs):
@@ -39,13 +51,20 @@ class Motivator(nn.Module):
         self.env = env
 
         self.height = self.inner_env.height
-        self.width = self.inner_env.height
+        self.width = self.inner_env.width
         self.action_height = self.inner_env.action_height
         self.action_width = self.inner_env.action_width
         self.birth = self.inner_env.birth
         self.survive = self.inner_env.survive
         self.my_device = self.inner_env.my_device
 
+        # worker thread and pending step for `step_async`
+        self.executor = None
+        self.pending_step = None
+
+        # per-layer step timing, see `enable_timing`
+        self.timer = None
+
     def rules_from_string(self, my_string="B3/S23"):
     
         self.inner_env.rules_from_string(my_string)
@@ -69,12 +88,131 @@ class Motivator(nn.Module):
         
         return obs
 
+    def reset_instances(self, indices):
+        """
+        reset only some instances of the inner environment
+        (see CARLE.reset_instances)
+        """
+
+        obs = self.env.reset_instances(indices)
+
+        self.reset_instance_state(self.inner_env.get_instance_mask(indices), obs)
+
+        return obs
+
+    def reset_instance_state(self, mask, obs):
+        """
+        clear this layer's per-instance state (e.g. histories) for the
+        instances in a boolean mask [instances], given their new observation.
+        Called by `reset_instances`, and by `reset_expired` for instances
+        autoreset by the inner env
+        """
+
+        pass
+
+    def reset_expired(self, done, obs):
+        """
+        clear per-instance state of instances the inner env autoreset this
+        step (only possible with `max_steps`)
+        """
+
+        if self.inner_env.max_steps is not None:
+            self.reset_instance_state(done.reshape(-1) != 0, obs)
+
     def step(self, action):
 
         obs, reward, done, info = self.env.step(action)
 
         return obs, reward, done, info
 
+    def step_async(self, action):
+        """
+        start `step` for the whole wrapper chain on a worker thread and
+        return its future, see CARLE.step_async
+        """
+
+        assert self.pending_step is None, "step_wait before the next step_async"
+
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1)
+
+        self.pending_step = self.executor.submit(self.step, action)
+
+        return self.pending_step
+
+    def step_wait(self):
+
+        result = self.pending_step.result()
+        self.pending_step = None
+
+        return result
+
+    def rollout(self, actions, stride=0):
+        """
+        step the whole wrapper chain for T generations, with rewards summed 
+        on-device (see CARLE.rollout for arguments)
+        """
+
+        if isinstance(actions, int):
+            generations = actions
+            zero_action = torch.zeros(self.inner_env.instances, 1, \
+                    self.action_height, self.action_width).to(self.my_device)
+        else:
+            generations = actions.shape[0]
+
+        assert 0 <= stride <= generations, \
+                f"stride {stride} must be between 0 and {generations} generations"
+
+        sum_reward = torch.zeros(self.inner_env.instances, 1).to(self.my_device)
+
+        # instances that were done at any point in the rollout
+        any_done = None
+
+        frames = []
+        for tt in range(generations):
+
+            if isinstance(actions, int):
+                action = zero_action
+            else:
+                action = actions[tt]
+
+            obs, reward, done, info = self.step(action)
+            sum_reward += reward
+
+            step_done = done != 0
+            any_done = step_done if any_done is None else any_done | step_done
+
+            if stride and (tt + 1) % stride == 0:
+                frames.append(obs.clone())
+
+        if stride:
+            obs = torch.stack(frames)
+
+        if any_done is not None:
+            done = any_done.to(done.dtype)
+
+        return obs, sum_reward, done, info
+
+    def enable_timing(self, **kwargs):
+        """
+        time `step` for every layer of the wrapper chain and the inner env,
+        see carle.instrumentation.StepTimer for keyword arguments.
+        Returns the timer (also kept as `self.timer`)
+        """
+
+        self.disable_timing()
+
+        self.timer = StepTimer(self, **kwargs)
+        self.timer.enable()
+
+        return self.timer
+
+    def disable_timing(self):
+
+        if self.timer is not None:
+            self.timer.disable()
+            self.timer = None
+
     def set_no_grad(self):
 
         pass
@@ -169,7 +307,7 @@ class MorphoBonus(Motivator):
 
     def step(self, action):
 
-        my_grid = torch.abs(self.inner_env.universe.clone() - action)
+        my_grid = torch.abs(self.inner_env.get_observation() - action)
         conv_obs = F.conv2d(my_grid, self.target_patterns)
 
         obs, reward, done, info = self.env.step(action)
@@ -184,13 +322,18 @@ class MorphoBonus(Motivator):
 
     def reset(self):
 
-        obs = self.env.reset()
+        _ = self.env.reset()
+
+        # imagine a little seed for nucleating patterns, written to the 
+        # universe itself (observations may be converted copies)
+        universe = self.inner_env.universe
+        seeds = torch.rand(universe.shape, device=universe.device) > 0.995
 
-        # imagine a little seed for nucleating patterns
-        obs += (torch.rand(obs.shape) > 0.995).to(self.my_device).float()
-        #obs = obs.to(self.my_device)
+        self.inner_env.universe = torch.logical_or(universe != 0, seeds)\
+                .to(self.inner_env.storage_dtype)
         #obs[:,:,32:35,32:35].fill(1.0)
-        #obs += torch.rand_like(obs)
+
+        obs = self.inner_env.get_observation()
         
         return obs
 
@@ -203,10 +346,11 @@ class CornerBonus(Motivator):
 
         self.reward_scale = 1.0
 
-        self.reward_mask = torch.zeros(1, 1, self.inner_env.height, \
-                self.inner_env.width).to(self.my_device)
-        self.punish_mask = torch.zeros(1, 1, self.inner_env.height, \
-                self.inner_env.width).to(self.my_device)
+        # buffers, so that they follow the module across devices
+        self.register_buffer("reward_mask", torch.zeros(1, 1, \
+                self.inner_env.height, self.inner_env.width).to(self.my_device))
+        self.register_buffer("punish_mask", torch.zeros(1, 1, \
+                self.inner_env.height, self.inner_env.width).to(self.my_device))
 
         self.reward_mask[:, :, :16, :16] = 1.0
         for ii in range(96):
@@ -215,12 +359,25 @@ class CornerBonus(Motivator):
         self.punish_mask[:, :, -64:, -64:] = -1.0
         self.punish_mask[:, :, :64, -64:] = -1.0
 
+    def get_stat_weights(self):
+        """
+        per-cell weight columns [height * width, k], whose products with the
+        flattened observation are the statistics used by `bonus_from_stats`
+        """
+
+        return torch.cat([self.reward_mask.reshape(-1, 1), \
+                self.punish_mask.reshape(-1, 1)], dim=1)
+
+    def bonus_from_stats(self, stats, action):
+
+        return self.reward_scale * (stats[:, 0:1] + stats[:, 1:2])
+
     def step(self, action):
 
         obs, reward, done, info = self.env.step(action)
         
-        reward += self.reward_scale * (self.reward_mask * obs).sum(axis=-1).sum(axis=-1)
-        reward += self.reward_scale * (self.punish_mask * obs).sum(axis=-1).sum(axis=-1)
+        stats = get_stats(obs, self.get_stat_weights())
+        reward += self.bonus_from_stats(stats, action)
 
         return obs, reward, done, info
 
@@ -566,8 +723,35 @@ class PredictionBonus(AE2D):
 
         self.prediction_steps = 5
 
-        self.grid_buffer = []
+        # ring buffer of the last `prediction_steps` observations,
+        # allocated by `reset_grid_buffer`
+        self.grid_buffer = None
+        self.grid_head = 0
+        self.grid_count = 0
+
+    def reset_grid_buffer(self, obs):
+        """
+        allocate the frame history as uint8 [prediction_steps, *obs.shape]
+        on the observation's device
+        """
+
+        self.grid_buffer = torch.zeros(self.prediction_steps, *obs.shape, \
+                dtype=torch.uint8, device=obs.device)
+        self.grid_head = 0
+        self.grid_count = 0
+
+    def reset_instance_state(self, mask, obs):
+        """
+        fill the history of reset instances with their new observation, so
+        the model sees it as it would with an empty history
+        """
+
+        if self.grid_buffer is None \
+                or self.grid_buffer.shape[1:] != obs.shape:
+            return
 
+        self.grid_buffer = torch.where(mask.reshape(1, -1, 1, 1, 1), \
+                obs.to(torch.uint8).unsqueeze(0), self.grid_buffer)
 
     def forward(self, obs):
 
@@ -580,22 +764,28 @@ class PredictionBonus(AE2D):
 
     def get_bonus(self, obs):
 
-        self.grid_buffer.append(obs)
+        if self.grid_buffer is None \
+                or self.grid_buffer.shape != (self.prediction_steps, *obs.shape):
+            self.reset_grid_buffer(obs)
 
-        #loss = torch.zeros(obs.shape[0]).to(self.my_device)
-
-        #for step in range(1, len(self.grid_buffer)):
+        # feed the oldest frame in the history (up to `prediction_steps` 
+        # back) to the model, or the current frame if there is no history
+        if self.grid_count:
+            oldest = (self.grid_head - self.grid_count) % self.prediction_steps
+            my_input = self.grid_buffer[oldest].to(obs.dtype)
+        else:
+            my_input = obs
 
-        # feed frame to model
-        prediction = self.forward(self.grid_buffer[0])
-        # target is the next frame
-        my_target = self.grid_buffer[-1]
+        prediction = self.forward(my_input)
+        # target is the current frame
+        my_target = obs
 
         loss = torch.mean(torch.abs((my_target-prediction)**2),\
                 dim=[1,2,3]) #+ my_target.mean(dim=[1,2,3])
 
-        if len(self.grid_buffer) > self.prediction_steps:
-            _ = self.grid_buffer.pop(0)
+        self.grid_buffer[self.grid_head] = obs
+        self.grid_head = (self.grid_head + 1) % self.prediction_steps
+        self.grid_count = min(self.grid_count + 1, self.prediction_steps)
 
         # loss is a tensor used for vectorized rnd reward bonuses
 
@@ -681,15 +871,16 @@ class PredictionBonus(AE2D):
         action = action.to(self.inner_env.my_device)
         obs, reward, done, info = self.env.step(action)
 
+        self.reset_expired(done, obs)
+
         prediction_bonus = self.get_bonus_accumulate(obs).unsqueeze(1)
 
         bonus = (0.1 -  prediction_bonus) #+ (obs.mean(dim=[1,2,3]) )
         my_mean = obs.mean(dim=[1,2,3])
 
-        for ii in range(my_mean.shape[0]):
-            if my_mean[ii] == 0.0:
-                bonus[ii] *= 0.0
-
+        # no bonus for empty universes
+        bonus = torch.where(my_mean.unsqueeze(1) == 0.0, \
+                torch.zeros_like(bonus), bonus)
 
         reward += self.reward_scale * bonus
 
@@ -715,10 +906,9 @@ class SurpriseBonus(AE2D):
         bonus = prediction_bonus #+ (obs.mean(dim=[1,2,3]) )
         my_mean = obs.mean(dim=[1,2,3])
 
-        for ii in range(my_mean.shape[0]):
-            if my_mean[ii] == 0.0:
-                bonus[ii] *= 0.0
-
+        # no bonus for empty universes
+        bonus = torch.where(my_mean.unsqueeze(1) == 0.0, \
+                torch.zeros_like(bonus), bonus)
 
         reward += self.reward_scale * bonus
 
@@ -728,21 +918,23 @@ class SurpriseBonus(AE2D):
         return obs, reward, done, info
 
 class SpeedDetector(Motivator):
+    """
+    Rewards each instance for the speed of its center of mass (outside the 
+    action area). The universe is a torus, so centers of mass are circular
+    means from sin/cos moments along each axis, and velocities are wrapped
+    to the shortest displacement. A glider crossing an edge moves one cell,
+    not a grid width.
+    """
 
     def __init__(self, env, **kwargs):
         super(SpeedDetector, self).__init__(env, **kwargs)
 
-        self.reward_scale = 1.0
+        self.my_name = "SpeedDetector"
 
-        self.center_of_mass = None 
+        self.reward_scale = 1.0
 
         self.speed_modulator = 32.0
 
-        self.mass_weight_w = torch.arange(self.inner_env.height)\
-                .reshape(1, -1).to(self.my_device)
-        self.mass_weight_h = torch.arange(self.inner_env.width)\
-                .reshape(-1, 1).to(self.my_device)
-
         # make a mass to exclude the action area: gliders/mobility is only 
         # rewarded outside of it. 
 
@@ -753,53 +945,102 @@ class SpeedDetector(Motivator):
 
         action_mask = torch.ones_like(action_mask) - action_mask
 
-        # mask the center of mass matrices
-        self.mass_weight_h = self.mass_weight_h * action_mask
-        self.mass_weight_w = self.mass_weight_w * action_mask
+        # phase of each row and column around the torus
+        angle_h = 2 * np.pi * torch.arange(self.inner_env.height) \
+                / self.inner_env.height
+        angle_w = 2 * np.pi * torch.arange(self.inner_env.width) \
+                / self.inner_env.width
 
-        self.growing_steps = 0
-        self.smooth_velocity = None
-        self.speed = None
+        angle_h = angle_h.reshape(1, 1, -1, 1).to(self.my_device)
+        angle_w = angle_w.reshape(1, 1, 1, -1).to(self.my_device)
 
-        self.velocity = torch.tensor([self.inner_env.instances, 1, 0., 0.])\
-                .to(self.my_device)
+        # precomputed (action-masked) moments: mass, then cos and sin along
+        # each axis, as columns [height * width, 5]
+        moments = [torch.ones_like(angle_h), torch.cos(angle_h), \
+                torch.sin(angle_h), torch.cos(angle_w), torch.sin(angle_w)]
+
+        self.register_buffer("moment_weights", torch.cat([\
+                (moment * action_mask).reshape(-1, 1) for moment in moments], \
+                dim=1))
+
+        # per-instance state, [instances, 2] (h, w) and [instances]
+        self.center_of_mass = None 
+        self.velocity = None
+        self.speed = None
 
         self.live_cells = None
 
-    def step(self, action):
+    def reset_instance_state(self, mask, obs):
+        """
+        reset instances have no previous center of mass, so their next
+        speed is zero
+        """
 
-        obs, reward, done, info = self.env.step(action)
+        if self.center_of_mass is None \
+                or self.live_cells.shape[0] != mask.shape[0]:
+            return
 
-        live_cells = torch.sum(self.inner_env.universe, dim=[1,2,3])
-        
+        self.live_cells = torch.where(mask, \
+                torch.zeros_like(self.live_cells), self.live_cells)
+        self.velocity = self.velocity * ~mask.unsqueeze(1)
+        self.speed = self.speed * ~mask
+
+    def get_stat_weights(self):
+        """
+        live cells and sin/cos moments (outside the action area)
+        """
 
-        center_of_mass_h = torch.sum(obs * self.mass_weight_h, dim=[1,2,3]) \
-                / (live_cells + 1e-7)
-        center_of_mass_w = torch.sum(obs * self.mass_weight_w, dim=[1,2,3]) \
-                / (live_cells + 1e-7)
+        return self.moment_weights
 
-        center_of_mass = torch.cat([center_of_mass_h.unsqueeze(0), \
-                center_of_mass_w.unsqueeze(0)])
+    def bonus_from_stats(self, stats, action):
 
-        if self.center_of_mass is None:
-            self.center_of_mass = center_of_mass
-        else:
-            velocity = self.center_of_mass - center_of_mass
+        # live cells outside the action area
+        live_cells = stats[:, 0]
 
-            speed = torch.sqrt(torch.sum(torch.pow(velocity, 2)))
+        sizes = torch.tensor([self.inner_env.height, self.inner_env.width], \
+                dtype=stats.dtype, device=stats.device)
+
+        # circular mean along each axis, in cells
+        angles = torch.atan2(stats[:, [2, 4]], stats[:, [1, 3]])
+        center_of_mass = torch.remainder(angles / (2 * np.pi), 1.0) * sizes
+
+        if self.center_of_mass is None \
+                or self.center_of_mass.shape != center_of_mass.shape:
 
-            self.speed = speed
-            self.velocity = velocity
             self.center_of_mass = center_of_mass
+            self.velocity = torch.zeros_like(center_of_mass)
+            self.speed = torch.zeros_like(live_cells)
+            self.live_cells = live_cells
+
+            return torch.zeros_like(live_cells).unsqueeze(1)
 
-            reward += speed
+        # shortest displacement on the torus
+        velocity = center_of_mass - self.center_of_mass
+        velocity = torch.remainder(velocity + sizes / 2, sizes) - sizes / 2
 
+        # no center of mass without live cells
+        moving = (live_cells > 0) & (self.live_cells > 0)
+        velocity = velocity * moving.unsqueeze(1)
+
+        speed = torch.sqrt(torch.sum(torch.pow(velocity, 2), dim=1))
+
+        self.speed = speed
+        self.velocity = velocity
+        self.center_of_mass = center_of_mass
         self.live_cells = live_cells
 
-        return obs, reward, done, info
+        return self.reward_scale * speed.unsqueeze(1)
 
+    def step(self, action):
 
-        
+        obs, reward, done, info = self.env.step(action)
+
+        self.reset_expired(done, obs)
+
+        stats = get_stats(obs, self.get_stat_weights())
+        reward += self.bonus_from_stats(stats, action)
+
+        return obs, reward, done, info
 
 class PufferDetector(Motivator):
 
@@ -816,40 +1057,210 @@ class PufferDetector(Motivator):
 
         self.my_name = "PufferDetector"
 
-        self.cells = []
-        self.live_cells = 0.0
+        self.live_cells = None
         self.reward_scale = 1.0
         
-        # growth threshold is also used to calculate the exponential average num live cells
+        # number of action-free steps in the window used to fit growth
         self.growth_threshold = 512
 
-        self.growing_steps = 0
-    
+        # per-instance history, allocated by `reset_history`
+        self.cells = None
+
+        # live cells as a weight column, for fused statistics
+        self.register_buffer("stat_weights", torch.ones(\
+                self.inner_env.height * self.inner_env.width, 1, \
+                device=self.my_device))
+
+    def reset_history(self, instances, device):
+        """
+        allocate the ring buffer of live cell counts [instances, window] and
+        the running sums for the least-squares slope. All history is int64,
+        so the running sums are exact.
+        """
+
+        window = self.growth_threshold
+
+        self.cells = torch.zeros(instances, window, \
+                dtype=torch.int64, device=device)
+        self.cell_counts = torch.zeros(instances, \
+                dtype=torch.int64, device=device)
+
+        # sum of counts, and sum of counts weighted by position in the window
+        self.sum_cells = torch.zeros_like(self.cell_counts)
+        self.sum_weighted_cells = torch.zeros_like(self.cell_counts)
+
+        self.head = 0
+
+    def reset_instance_state(self, mask, obs):
+        """
+        reset instances start a new window
+        """
+
+        if self.cells is None or self.cells.shape[0] != mask.shape[0]:
+            return
+
+        zeros = torch.zeros_like(self.cell_counts)
+
+        self.cell_counts = torch.where(mask, zeros, self.cell_counts)
+        self.sum_cells = torch.where(mask, zeros, self.sum_cells)
+        self.sum_weighted_cells = torch.where(mask, zeros, \
+                self.sum_weighted_cells)
+
+    def get_acted(self, action, instances):
+        """
+        per-instance mask of instances that received any action
+        (a batch-1 action applies to every instance)
+        """
+
+        action = torch.as_tensor(action).to(self.cell_counts.device)
+        acted = action.reshape(action.shape[0], -1).sum(-1) != 0
+
+        return acted.expand(instances)
+
+    def get_stat_weights(self):
+        """
+        a single column of ones, for live cells per instance
+        """
+
+        return self.stat_weights
+
+    def bonus_from_stats(self, stats, action):
+        """
+        push live cell counts into the ring buffer and reward instances whose
+        fitted growth over a full, action-free window is positive.
+        Instances that received an action start a new window. 
+        """
+
+        instances = stats.shape[0]
+        window = self.growth_threshold
+
+        if self.cells is None or self.cells.shape != (instances, window) \
+                or self.cells.device != stats.device:
+            self.reset_history(instances, stats.device)
+
+        live_cells = torch.round(stats[:, 0]).to(torch.int64)
+        acted = self.get_acted(action, instances)
+
+        count = self.cell_counts
+        full = count == window
+
+        # the oldest count is overwritten when the window is full
+        oldest = torch.gather(self.cells, 1, \
+                ((self.head - count) % window).unsqueeze(1)).squeeze(1)
+        oldest = torch.where(full, oldest, torch.zeros_like(oldest))
+
+        # moving the window shifts every remaining position down by one
+        sum_weighted_cells = torch.where(full, \
+                self.sum_weighted_cells - (self.sum_cells - oldest), \
+                self.sum_weighted_cells) \
+                + torch.clamp(count, max=window - 1) * live_cells
+        sum_cells = self.sum_cells - oldest + live_cells
+        count = torch.clamp(count + 1, max=window)
+
+        self.cells[:, self.head] = live_cells
+        self.head = (self.head + 1) % window
+
+        # instances that acted start over
+        zeros = torch.zeros_like(count)
+        self.cell_counts = torch.where(acted, zeros, count)
+        self.sum_cells = torch.where(acted, zeros, sum_cells)
+        self.sum_weighted_cells = torch.where(acted, zeros, sum_weighted_cells)
+
+        # least-squares slope against positions 0 ... n-1
+        n = count.to(torch.float64)
+        sum_x = n * (n - 1) / 2
+        sum_xx = (n - 1) * n * (2 * n - 1) / 6
+        numerator = n * sum_weighted_cells.to(torch.float64) \
+                - sum_x * sum_cells.to(torch.float64)
+        denominator = torch.clamp(n * sum_xx - sum_x**2, min=1.0)
+
+        # fitted growth across the window
+        growth = (numerator / denominator) * (n - 1)
+
+        growing = (self.cell_counts == window) & (growth > 0.01)
+
+        self.live_cells = live_cells
+
+        return self.reward_scale * growing.to(stats.dtype).unsqueeze(1)
+
     def step(self, action):
 
         obs, reward, done, info = self.env.step(action)
 
-        self.live_cells = torch.sum(self.inner_env.universe).cpu().numpy() 
+        self.reset_expired(done, obs)
 
+        # a plain sum is cheaper than a matmul for a single column of ones
+        stats = torch.sum(obs, dim=[2, 3])
+        reward += self.bonus_from_stats(stats, action)
         
-        if not(torch.sum(action)):
+        return obs, reward, done, info
+
+class FusedDetectors(Motivator):
+    """
+    Computes the bonuses of several statistics-based detectors (CornerBonus,
+    SpeedDetector, PufferDetector) from a single matmul of the flattened
+    observation against their stacked weight columns, instead of one full
+    pass over the universe per wrapper. Rewards match stacking the
+    detectors as separate wrappers.
+    """
 
-            self.cells.append(self.live_cells)
+    def __init__(self, env, **kwargs):
+        """
+            detectors - detector classes, each with `get_stat_weights` and
+                `bonus_from_stats`, default [SpeedDetector, PufferDetector]
+            reward_scales - a reward_scale for each detector, default None
+                (keep each detector's own default)
+        """
+        super(FusedDetectors, self).__init__(env, **kwargs)
 
-            if len(self.cells) > self.growth_threshold:
-                slope = self.cells[-1] - self.cells[0]
+        self.my_name = "FusedDetectors"
 
-                self.cells.pop(0)
-                if slope > 0.01:
-                    reward += 1
+        detector_classes = kwargs.get("detectors", \
+                [SpeedDetector, PufferDetector])
+        reward_scales = kwargs.get("reward_scales", None)
 
+        # detectors are only used for their statistics and state, 
+        # the wrapped env is never stepped through them
+        self.detectors = nn.ModuleList([detector_class(env) \
+                for detector_class in detector_classes])
 
-        else:
-            self.growing_steps = 0
-            self.cells = []
-        
+        if reward_scales is not None:
+            for detector, reward_scale in zip(self.detectors, reward_scales):
+                detector.reward_scale = reward_scale
+
+        # stacked weight columns, set by `refresh_weights`
+        self.register_buffer("stat_weights", None)
+
+        self.refresh_weights()
+
+    def reset_instance_state(self, mask, obs):
+
+        for detector in self.detectors:
+            detector.reset_instance_state(mask, obs)
+
+    def refresh_weights(self):
+        """
+        restack the weight columns, call after changing a detector's masks
+        """
+
+        weights = [detector.get_stat_weights() for detector in self.detectors]
+
+        self.stat_weights = torch.cat(weights, dim=1)
+        self.stat_splits = [weight.shape[1] for weight in weights]
+
+    def step(self, action):
+
+        obs, reward, done, info = self.env.step(action)
+
+        self.reset_expired(done, obs)
+
+        stats = get_stats(obs, self.stat_weights)
+
+        for detector, detector_stats in zip(self.detectors, \
+                torch.split(stats, self.stat_splits, dim=1)):
+
+            reward += detector.bonus_from_stats(detector_stats, action)
 
-        
         return obs, reward, done, info
 
 def get_symmetric_action(probability=0.125, vertical_symmetry=False):
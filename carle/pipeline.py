@@ -0,0 +1,44 @@
+"""
+pipelined stepping for CARLE
+
+    PipelinedRunner alternates between groups of instances, each its own
+    environment (CARLE or a wrapper stack): while one group is simulated on
+    its worker thread (see CARLE.step_async), the agent computes actions for
+    the next group. With two groups, the cost of the cheaper of agent
+    inference and environment stepping is mostly hidden.
+"""
+
+
+class PipelinedRunner():
+
+    def __init__(self, envs, agent):
+        """
+            envs - a list of environments, one per instance group
+            agent - callable mapping a group's observation to its action
+        """
+
+        self.envs = envs
+        self.agent = agent
+
+    def run(self, steps):
+        """
+        reset and step every group `steps` times, yielding
+        (group index, observation, reward, done, info) as each group's step
+        finishes
+        """
+
+        observations = [env.reset() for env in self.envs]
+
+        # the action for group 1 is computed while group 0 is stepping, etc.
+        for env, obs in zip(self.envs, observations):
+            env.step_async(self.agent(obs))
+
+        for step in range(steps):
+            for group, env in enumerate(self.envs):
+
+                obs, reward, done, info = env.step_wait()
+
+                yield group, obs, reward, done, info
+
+                if step < steps - 1:
+                    env.step_async(self.agent(obs))
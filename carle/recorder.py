@@ -0,0 +1,283 @@
+"""
+streaming frame recording for CARLE
+
+    FrameRecorder tiles several instances into one canvas, maps cell values
+    to a 128 color palette and streams frames to:
+        .gif - an animated GIF, written frame by frame
+        .npy - a (frames, height, width) uint8 array of palette indices,
+            written frame by frame (the header is updated on close)
+        .npz - chunks of frames, buffered in memory up to `max_memory` bytes
+
+    GIF frames are stored with "uncompressed" LZW: 8-bit codes that are the
+    palette indices themselves, with a clear code often enough that the code
+    size never grows. Files are larger than with real LZW, but encoding is a
+    few numpy operations per frame.
+"""
+
+import struct
+import zipfile
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+# 127 colors for cell values, plus a border color
+COLORS = 127
+BORDER = 127
+
+GIF_CODE_SIZE = 7
+GIF_CLEAR = 2**GIF_CODE_SIZE
+GIF_END = GIF_CLEAR + 1
+# pixels between clear codes, small enough that the code table stays below
+# 256 entries (8-bit codes)
+GIF_RUN = 120
+
+NPY_HEADER_LENGTH = 128
+
+
+def get_palette(colormap="magma"):
+    """
+    (128, 3) uint8 palette: `colormap` sampled at 127 points, and gray for
+    borders
+    """
+
+    colors = plt.get_cmap(colormap)(np.linspace(0, 1.0, COLORS))
+
+    palette = np.zeros((COLORS + 1, 3), dtype=np.uint8)
+    palette[:COLORS] = np.uint8(255 * colors[:, :3])
+    palette[BORDER] = 128
+
+    return palette
+
+def gif_image_data(frame):
+    """
+    LZW image data sub-blocks for a 2D array of palette indices (< 128)
+    """
+
+    pixels = frame.reshape(-1).astype(np.uint8)
+    length = pixels.shape[0]
+    runs = -(-length // GIF_RUN)
+
+    padded = np.zeros(runs * GIF_RUN, dtype=np.uint8)
+    padded[:length] = pixels
+
+    codes = np.concatenate([np.full((runs, 1), GIF_CLEAR, dtype=np.uint8), \
+            padded.reshape(runs, GIF_RUN)], axis=1).reshape(-1)
+    codes = np.append(codes[:length + runs], np.uint8(GIF_END))
+
+    # split into sub-blocks of at most 255 bytes, each prefixed by its length
+    blocks = -(-codes.shape[0] // 255)
+    last = codes.shape[0] - 255 * (blocks - 1)
+
+    lengths = np.full((blocks, 1), 255, dtype=np.uint8)
+    lengths[-1] = last
+
+    body = np.zeros(blocks * 255, dtype=np.uint8)
+    body[:codes.shape[0]] = codes
+
+    data = np.concatenate([lengths, body.reshape(blocks, 255)], axis=1)
+    data = data.reshape(-1)[:256 * (blocks - 1) + 1 + last]
+
+    return bytes([GIF_CODE_SIZE]) + data.tobytes() + b"\x00"
+
+class FrameRecorder():
+
+    def __init__(self, filepath, **kwargs):
+        """
+            filepath - output file, ending in .gif, .npy or .npz
+            instances - instances to record, a number (the first n) or a list
+                of indices. Default 1
+            columns - instances per canvas row, default about sqrt(instances)
+            scale - integer upscaling of each cell, default 1
+            border - pixels between instances, default 1
+            colormap - matplotlib colormap name for the palette
+            fps - GIF playback frames per second, default 10
+            loop - GIF repetitions, 0 loops forever
+            max_memory - bytes of frames buffered for .npz before a chunk is
+                written, default 64 MB
+        """
+
+        self.filepath = filepath
+        self.format = filepath.split(".")[-1]
+
+        assert self.format in ["gif", "npy", "npz"], \
+                f"unsupported recording format {self.format}"
+
+        instances = kwargs.get("instances", 1)
+
+        if isinstance(instances, int):
+            instances = list(range(instances))
+
+        self.instances = instances
+        self.columns = kwargs.get("columns", \
+                int(np.ceil(np.sqrt(len(self.instances)))))
+        self.rows = -(-len(self.instances) // self.columns)
+
+        self.scale = kwargs.get("scale", 1)
+        self.border = kwargs.get("border", 1)
+        self.palette = get_palette(kwargs.get("colormap", "magma"))
+        self.fps = kwargs.get("fps", 10)
+        self.loop = kwargs.get("loop", 0)
+        self.max_memory = kwargs.get("max_memory", 64 * 2**20)
+
+        self.frames = 0
+        self.file = None
+        self.buffer = []
+        self.buffered_bytes = 0
+        self.chunks = 0
+
+    def open(self, height, width):
+
+        self.height = height
+        self.width = width
+
+        if self.format == "gif":
+            self.file = open(self.filepath, "wb")
+
+            # header, logical screen with a 128 color global palette
+            self.file.write(b"GIF89a")
+            self.file.write(struct.pack("<HHBBB", width, height, \
+                    0xF0 | (GIF_CODE_SIZE - 1), 0, 0))
+            self.file.write(self.palette.tobytes())
+
+            # NETSCAPE2.0 extension for looping
+            self.file.write(b"\x21\xFF\x0BNETSCAPE2.0\x03\x01")
+            self.file.write(struct.pack("<HB", self.loop, 0))
+
+        elif self.format == "npy":
+            self.file = open(self.filepath, "wb")
+            self.write_npy_header()
+
+        else:
+            self.file = zipfile.ZipFile(self.filepath, "w", \
+                    compression=zipfile.ZIP_DEFLATED)
+
+    def write_npy_header(self):
+        """
+        npy format 1.0 header, padded to a fixed length so that it can be
+        rewritten in place with the final frame count
+        """
+
+        header = "{{'descr': '|u1', 'fortran_order': False, 'shape': ({}, {}, {}), }}"\
+                .format(self.frames, self.height, self.width)
+        header = header.ljust(NPY_HEADER_LENGTH - 10 - 1) + "\n"
+
+        self.file.write(b"\x93NUMPY\x01\x00")
+        self.file.write(struct.pack("<H", len(header)))
+        self.file.write(header.encode("latin1"))
+
+    def to_canvas(self, universe):
+        """
+        tile the recorded instances of a (instances, 1, height, width)
+        tensor or array into one 2D array of palette indices
+        """
+
+        if not isinstance(universe, np.ndarray):
+            universe = universe[self.instances].detach().cpu().numpy()
+        else:
+            universe = universe[self.instances]
+
+        universe = universe.reshape(len(self.instances), \
+                universe.shape[-2], universe.shape[-1])
+
+        cells = np.uint8(np.rint((COLORS - 1) \
+                * np.clip(universe.astype(np.float32), 0.0, 1.0)))
+
+        if self.scale > 1:
+            cells = cells.repeat(self.scale, axis=1).repeat(self.scale, axis=2)
+
+        cell_height, cell_width = cells.shape[1:]
+        step_height = cell_height + self.border
+        step_width = cell_width + self.border
+
+        canvas = np.full((self.rows * step_height - self.border, \
+                self.columns * step_width - self.border), BORDER, dtype=np.uint8)
+
+        for kk in range(len(self.instances)):
+
+            row = (kk // self.columns) * step_height
+            col = (kk % self.columns) * step_width
+
+            canvas[row:row + cell_height, col:col + cell_width] = cells[kk]
+
+        return canvas
+
+    def add(self, universe):
+        """
+        record one frame from a (instances, 1, height, width) universe
+        or observation
+        """
+
+        canvas = self.to_canvas(universe)
+
+        if self.file is None:
+            self.open(*canvas.shape)
+
+        if self.format == "gif":
+            delay = int(round(100 / self.fps))
+
+            # graphic control extension (frame delay), image descriptor
+            self.file.write(struct.pack("<BBBBHBB", 0x21, 0xF9, 4, 0, \
+                    delay, 0, 0))
+            self.file.write(struct.pack("<BHHHHB", 0x2C, 0, 0, \
+                    self.width, self.height, 0))
+            self.file.write(gif_image_data(canvas))
+
+        elif self.format == "npy":
+            self.file.write(canvas.tobytes())
+
+        else:
+            self.buffer.append(canvas)
+            self.buffered_bytes += canvas.nbytes
+
+            if self.buffered_bytes >= self.max_memory:
+                self.write_chunk()
+
+        self.frames += 1
+
+    def write_chunk(self):
+
+        if len(self.buffer) == 0:
+            return
+
+        with self.file.open("frames_{:06d}.npy".format(self.chunks), "w") as f:
+            np.lib.format.write_array(f, np.stack(self.buffer))
+
+        self.chunks += 1
+        self.buffer = []
+        self.buffered_bytes = 0
+
+    def close(self):
+
+        if self.file is None:
+            return
+
+        if self.format == "gif":
+            self.file.write(b"\x3B")
+
+        elif self.format == "npy":
+            self.file.seek(0)
+            self.write_npy_header()
+
+        else:
+            self.write_chunk()
+
+            with self.file.open("palette.npy", "w") as f:
+                np.lib.format.write_array(f, self.palette)
+
+        self.file.close()
+        self.file = None
+
+def load_frames(filepath):
+    """
+    load a .npy or .npz recording as a (frames, height, width) array of
+    palette indices
+    """
+
+    if filepath.endswith(".npy"):
+        return np.load(filepath)
+
+    with np.load(filepath) as recording:
+        chunks = sorted([key for key in recording.files \
+                if key.startswith("frames_")])
+
+        return np.concatenate([recording[key] for key in chunks])
@@ -0,0 +1,189 @@
+"""
+vectorized run-length encoding (RLE) for CARLE universes
+
+    Runs are found with numpy over all rows (and instances) at once, so the
+    only Python-level work is joining one short token per run.
+"""
+
+import re
+
+import numpy as np
+
+
+def run_tokens(grids):
+    """
+    run-length tokens for a stack of binary grids (instances, height, width)
+
+    returns one array of tokens per grid, e.g. ["3b", "2o", "251b$", ...],
+    where the last run of each row is terminated with "$"
+    """
+
+    grids = np.asarray(grids) != 0
+    instances, height, width = grids.shape
+
+    # a run ends where the next cell differs, or at the end of a row
+    run_end = np.ones(grids.shape, dtype=bool)
+    run_end[:, :, :-1] = grids[:, :, 1:] != grids[:, :, :-1]
+
+    ends = np.flatnonzero(run_end)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+
+    lengths = (ends - starts + 1).astype(str)
+    states = np.where(grids.reshape(-1)[ends], "o", "b")
+    row_ends = np.where(ends % width == width - 1, "$", "")
+
+    tokens = np.char.add(np.char.add(lengths, states), row_ends)
+
+    # every grid has height * width cells, split tokens between grids
+    splits = np.searchsorted(ends, \
+            np.arange(1, instances) * height * width)
+
+    return np.split(tokens, splits)
+
+def wrap_tokens(tokens, line_length=70):
+    """
+    join tokens into lines, starting a new line once a line is longer than
+    `line_length` - 1 characters (the wrapping used by CARLE.get_rle)
+    """
+
+    rle = ""
+    line = ""
+
+    for token in tokens.tolist():
+
+        line += token
+
+        if len(line) >= line_length:
+            rle += line + "\n"
+            line = ""
+
+    return rle + line
+
+# run-length tokens: an optional count followed by a state or "$" / "!"
+RLE_TOKEN = re.compile(r"(\d*)([^\d\s])")
+RLE_SIZE = re.compile(r"^x\s*=\s*(\d+)\s*,\s*y\s*=\s*(\d+)")
+RLE_RULE = re.compile(r"rule\s*=\s*([^\s:,]+)")
+# placement offsets: "#P x y", "#R x y" or "#CXRLE Pos=x,y"
+RLE_POSITION = re.compile(r"^#(?:[PR]\s+|CXRLE.*Pos\s*=\s*)(-?\d+)[\s,]+(-?\d+)")
+
+def decode_body(body):
+    """
+    decode the pattern part of an rle (e.g. "bo$2bo$3o!") into a uint8 array
+    just large enough to hold it
+    """
+
+    tokens = RLE_TOKEN.findall(body.split("!")[0])
+
+    if len(tokens) == 0:
+        return np.zeros((0, 0), dtype=np.uint8)
+
+    counts = np.array([int(count) if count else 1 for count, tag in tokens])
+    tags = np.array([tag for count, tag in tokens])
+
+    is_row = tags == "$"
+    # any state other than dead ("b" or ".") is treated as alive
+    is_alive = ~is_row & (tags != "b") & (tags != ".")
+
+    row_counts = np.where(is_row, counts, 0)
+    cell_counts = np.where(is_row, 0, counts)
+
+    # exclusive cumulative sums give each token's row and cell position
+    rows = np.cumsum(row_counts) - row_counts
+    cell_starts = np.cumsum(cell_counts) - cell_counts
+
+    # columns restart after the most recent "$"
+    last_row_token = np.maximum.accumulate(\
+            np.where(is_row, np.arange(len(tokens)), -1))
+    row_starts = np.where(last_row_token >= 0, \
+            cell_starts[np.maximum(last_row_token, 0)], 0)
+    cols = cell_starts - row_starts
+
+    is_cell = ~is_row
+    height = rows[is_cell].max() + 1 if is_cell.any() else 0
+    width = (cols + cell_counts)[is_cell].max() if is_cell.any() else 0
+
+    cells = np.zeros((height, width), dtype=np.uint8)
+
+    # expand live runs into individual cell coordinates
+    alive_counts = counts[is_alive]
+    run_index = np.repeat(np.arange(alive_counts.shape[0]), alive_counts)
+    run_offset = np.arange(run_index.shape[0]) \
+            - np.repeat(np.cumsum(alive_counts) - alive_counts, alive_counts)
+
+    cells[rows[is_alive][run_index], cols[is_alive][run_index] + run_offset] = 1
+
+    return cells
+
+def decode_rle(rle):
+    """
+    decode rle text, with or without headers
+
+    returns a uint8 array of cells and a dict of header information:
+        "width", "height" - pattern size from the `x = , y = ` line (or 0)
+        "rule" - B/S rule string (or None)
+        "position" - (row, col) placement offset from #P, #R
+            or #CXRLE Pos= lines (or None)
+        "body" - the pattern part of the rle
+    """
+
+    info = {"width": 0, "height": 0, "rule": None, "position": None}
+
+    body_lines = []
+    for line in rle.splitlines():
+
+        line = line.strip()
+
+        if line.startswith("#"):
+            position = RLE_POSITION.match(line)
+
+            if position is not None:
+                info["position"] = (int(position.group(2)), \
+                        int(position.group(1)))
+
+        elif RLE_SIZE.match(line):
+            size = RLE_SIZE.match(line)
+
+            info["width"] = int(size.group(1))
+            info["height"] = int(size.group(2))
+
+            rule = RLE_RULE.search(line)
+
+            if rule is not None:
+                info["rule"] = normalize_rule(rule.group(1))
+        else:
+            body_lines.append(line)
+
+    info["body"] = "\n".join(body_lines)
+
+    cells = decode_body(info["body"])
+
+    # headers may declare a larger pattern than its live cells cover
+    height = max(cells.shape[0], info["height"])
+    width = max(cells.shape[1], info["width"])
+
+    if (height, width) != cells.shape:
+        padded = np.zeros((height, width), dtype=np.uint8)
+        padded[:cells.shape[0], :cells.shape[1]] = cells
+        cells = padded
+
+    return cells, info
+
+def normalize_rule(rule_string):
+    """
+    convert "B3/S23" or S/B notation ("23/3") to "B3/S23" form
+    """
+
+    rule_string = rule_string.upper()
+
+    if "B" in rule_string or "S" in rule_string:
+        birth, survive = rule_string.split("/")
+
+        if birth.startswith("S"):
+            birth, survive = survive, birth
+    else:
+        survive, birth = rule_string.split("/")
+
+    birth = "".join([bb for bb in birth if bb.isdigit()])
+    survive = "".join([ss for ss in survive if ss.isdigit()])
+
+    return "B{}/S{}".format(birth, survive)
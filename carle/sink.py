@@ -0,0 +1,146 @@
+"""
+background I/O for CARLE logs, rle files and frames
+
+    AsyncSink runs writes (rle encoding, PNG encoding, trajectory compression
+    and the file writes themselves) on a worker thread, so the step loop only
+    pays for a snapshot of the tensors it needs and a queue put.
+"""
+
+import os
+import queue
+import threading
+
+
+class AsyncSink():
+
+    def __init__(self, max_queue=64, policy="block"):
+        """
+            max_queue - maximum number of pending writes
+            policy - what to do when the queue is full, "block" waits for the
+                worker (backpressure), "drop" discards the new write
+        """
+
+        assert policy in ["block", "drop"], f"unknown sink policy {policy}"
+
+        self.policy = policy
+        self.queue = queue.Queue(maxsize=max_queue)
+
+        self.dropped = 0
+        self.error = None
+
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def run(self):
+
+        while True:
+
+            job = self.queue.get()
+
+            if job is None:
+                self.queue.task_done()
+                break
+
+            function, args = job
+
+            try:
+                function(*args)
+            except Exception as error:
+                # kept and raised on the caller's thread by flush or close
+                self.error = error
+
+            self.queue.task_done()
+
+    def put(self, function, *args):
+        """
+        call function(*args) on the worker thread, returns False if the write
+        was dropped
+        """
+
+        self.raise_error()
+
+        if self.policy == "drop":
+            try:
+                self.queue.put_nowait((function, args))
+            except queue.Full:
+                self.dropped += 1
+
+                return False
+        else:
+            self.queue.put((function, args))
+
+        return True
+
+    def raise_error(self):
+
+        if self.error is not None:
+            error, self.error = self.error, None
+
+            raise error
+
+    def flush(self):
+        """
+        wait until all pending writes are done
+        """
+
+        self.queue.join()
+        self.raise_error()
+
+    def close(self):
+
+        if self.worker.is_alive():
+            self.queue.put(None)
+            self.worker.join()
+
+        self.raise_error()
+
+class RotatingFile():
+
+    def __init__(self, filepath, max_bytes=None, backups=3, header=""):
+        """
+        a text file that is moved to `filepath`.1 (then .2, ...) once it grows
+        past `max_bytes`, keeping at most `backups` old files.
+        `header` is written at the start of every file
+        """
+
+        self.filepath = filepath
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.header = header
+
+        self.file = open(self.filepath, "w")
+        self.file.write(self.header)
+
+    def rotate(self):
+
+        self.file.close()
+
+        for index in range(self.backups - 1, 0, -1):
+
+            older = "{}.{}".format(self.filepath, index)
+
+            if os.path.exists(older):
+                os.replace(older, "{}.{}".format(self.filepath, index + 1))
+
+        if self.backups > 0:
+            os.replace(self.filepath, "{}.1".format(self.filepath))
+
+        self.file = open(self.filepath, "w")
+        self.file.write(self.header)
+
+    def write(self, text):
+
+        if self.max_bytes is not None \
+                and self.file.tell() + len(text) > self.max_bytes \
+                and self.file.tell() > len(self.header):
+            self.rotate()
+
+        self.file.write(text)
+
+    def flush(self):
+
+        self.file.flush()
+
+    def close(self):
+
+        self.file.close()
@@ -0,0 +1,150 @@
+"""
+terminal rendering for CARLE universes
+
+    Frames are built as one string of Unicode block or braille glyphs and
+    written in a single call, repainting in place with ANSI cursor-home.
+        "half" - 2 cells per glyph (upper and lower half blocks)
+        "braille" - 8 cells per glyph (2 wide, 4 tall)
+"""
+
+import sys
+import time
+
+import numpy as np
+
+CURSOR_HOME = "\x1b[H"
+CLEAR_SCREEN = "\x1b[2J"
+
+# glyphs for (upper, lower) cells: none, upper, lower, both
+HALF_BLOCKS = np.array([ord(" "), 0x2580, 0x2584, 0x2588], dtype=np.uint32)
+
+# bit for the braille dot at each (row, col) of a 4 x 2 cell block
+BRAILLE_DOTS = np.array([[0x01, 0x08], [0x02, 0x10], [0x04, 0x20], [0x40, 0x80]], \
+        dtype=np.uint32)
+
+GLYPH_SIZE = {"half": (2, 1), "braille": (4, 2)}
+
+
+class TerminalRenderer():
+
+    def __init__(self, **kwargs):
+        """
+            mode - "half" or "braille"
+            instances - instances to show side by side, a number (the first n)
+                or a list of indices. Default 1
+            viewport - (top, left, height, width) crop of each universe,
+                default the whole universe
+            downsample - show blocks of downsample x downsample cells as one
+                cell (alive if any cell in the block is alive), default 1
+            fps - maximum frames per second, default no limit
+            stream - where frames are written, default sys.stdout
+        """
+
+        self.mode = kwargs.get("mode", "half")
+
+        assert self.mode in GLYPH_SIZE.keys(), f"unknown render mode {self.mode}"
+
+        instances = kwargs.get("instances", 1)
+
+        if isinstance(instances, int):
+            instances = list(range(instances))
+
+        self.instances = instances
+        self.viewport = kwargs.get("viewport", None)
+        self.downsample = kwargs.get("downsample", 1)
+        self.fps = kwargs.get("fps", None)
+        self.stream = kwargs.get("stream", sys.stdout)
+
+        self.last_frame_time = None
+
+    def get_cells(self, universe):
+        """
+        cropped and downsampled boolean cells (instances, height, width)
+        of a (instances, 1, height, width) tensor or array
+        """
+
+        if not isinstance(universe, np.ndarray):
+            universe = universe[self.instances].detach().cpu().numpy()
+        else:
+            universe = universe[self.instances]
+
+        cells = universe.reshape(len(self.instances), \
+                universe.shape[-2], universe.shape[-1]) != 0
+
+        if self.viewport is not None:
+            top, left, height, width = self.viewport
+            cells = cells[:, top:top + height, left:left + width]
+
+        if self.downsample > 1:
+            cells = self.pad(cells, self.downsample, self.downsample)
+
+            instances, height, width = cells.shape
+            cells = cells.reshape(instances, height // self.downsample, \
+                    self.downsample, width // self.downsample, self.downsample)
+            cells = cells.any(axis=4).any(axis=2)
+
+        return cells
+
+    def pad(self, cells, rows, cols):
+        """
+        pad with dead cells to a multiple of `rows` x `cols`
+        """
+
+        pad_height = -cells.shape[1] % rows
+        pad_width = -cells.shape[2] % cols
+
+        return np.pad(cells, ((0, 0), (0, pad_height), (0, pad_width)))
+
+    def to_glyphs(self, cells):
+        """
+        unicode code points (instances, lines, columns) for boolean cells
+        """
+
+        glyph_height, glyph_width = GLYPH_SIZE[self.mode]
+
+        cells = self.pad(cells, glyph_height, glyph_width)
+        instances, height, width = cells.shape
+
+        blocks = cells.reshape(instances, height // glyph_height, glyph_height, \
+                width // glyph_width, glyph_width).astype(np.uint32)
+
+        if self.mode == "half":
+            return HALF_BLOCKS[blocks[:, :, 0, :, 0] + 2 * blocks[:, :, 1, :, 0]]
+
+        dots = np.sum(blocks * BRAILLE_DOTS.reshape(1, 1, 4, 1, 2), axis=(2, 4))
+
+        return 0x2800 + dots
+
+    def get_frame(self, universe, title=""):
+        """
+        the full text of a frame, instances side by side
+        """
+
+        glyphs = self.to_glyphs(self.get_cells(universe))
+        instances, lines, columns = glyphs.shape
+
+        # one column of spaces between instances, and a newline after each line
+        frame = np.full((lines, instances * (columns + 1)), ord(" "), \
+                dtype=np.uint32)
+        frame = frame.reshape(lines, instances, columns + 1)
+        frame[:, :, :columns] = glyphs.transpose(1, 0, 2)
+        frame = frame.reshape(lines, -1)
+        frame[:, -1] = ord("\n")
+
+        return title + "\n" + frame.astype("<u4").tobytes().decode("utf-32-le")
+
+    def render(self, universe, title=""):
+
+        if self.fps is not None and self.last_frame_time is not None:
+            wait = 1.0 / self.fps - (time.perf_counter() - self.last_frame_time)
+
+            if wait > 0:
+                time.sleep(wait)
+
+        if self.last_frame_time is None:
+            self.stream.write(CLEAR_SCREEN)
+
+        self.stream.write(CURSOR_HOME + self.get_frame(universe, title))
+        self.stream.flush()
+
+        self.last_frame_time = time.perf_counter()
@@ -0,0 +1,141 @@
+"""
+active-tile stepping for sparse CARLE universes
+
+    The torus is split into square tiles, and each instance keeps a bitmap of
+    active tiles: tiles that changed in the last generation or were toggled by
+    an action. Only active tiles and their neighbors (the halo) can change in
+    the next generation, so only those are gathered and recomputed. Per-step
+    cost scales with live activity rather than grid area.
+"""
+
+import torch
+import torch.nn.functional as F
+
+
+class ActiveTiles():
+
+    def __init__(self, height, width, tile_size=16, device=torch.device("cpu")):
+
+        assert height % tile_size == 0 and width % tile_size == 0, \
+                f"universe ({height}, {width}) must be divisible "\
+                f"by tile size {tile_size}"
+
+        self.height = height
+        self.width = width
+        self.tile_size = tile_size
+        self.tiles_height = height // tile_size
+        self.tiles_width = width // tile_size
+        self.my_device = device
+
+        self.halo_range = torch.arange(-1, tile_size + 1).to(self.my_device)
+        self.tile_range = torch.arange(tile_size).to(self.my_device)
+
+    def ones(self, instances):
+
+        return torch.ones(instances, self.tiles_height, self.tiles_width, \
+                dtype=torch.bool, device=self.my_device)
+
+    def mark(self, cells):
+        """
+        bitmap of tiles that contain any nonzero cell,
+        for a (instances, 1, height, width) tensor
+        """
+
+        cells = (cells != 0).reshape(cells.shape[0], \
+                self.tiles_height, self.tile_size, \
+                self.tiles_width, self.tile_size)
+
+        return cells.any(dim=4).any(dim=2)
+
+    def mark_window(self, cells, top, left):
+        """
+        bitmap of tiles that contain any nonzero cell of a window
+        (instances, 1, height, width) placed at (top, left) in the universe,
+        at a cost proportional to the window
+        """
+
+        tile_top = top // self.tile_size
+        tile_left = left // self.tile_size
+        tile_bottom = -(-(top + cells.shape[2]) // self.tile_size)
+        tile_right = -(-(left + cells.shape[3]) // self.tile_size)
+
+        # pad the window out to tile boundaries
+        pad_top = top - tile_top * self.tile_size
+        pad_left = left - tile_left * self.tile_size
+        pad_bottom = tile_bottom * self.tile_size - top - cells.shape[2]
+        pad_right = tile_right * self.tile_size - left - cells.shape[3]
+
+        cells = F.pad((cells != 0).to(torch.uint8), \
+                (pad_left, pad_right, pad_top, pad_bottom))
+
+        cells = cells.reshape(cells.shape[0], \
+                tile_bottom - tile_top, self.tile_size, \
+                tile_right - tile_left, self.tile_size)
+
+        marked = torch.zeros(cells.shape[0], self.tiles_height, \
+                self.tiles_width, dtype=torch.bool, device=cells.device)
+        marked[:, tile_top:tile_bottom, tile_left:tile_right] = \
+                (cells != 0).any(dim=4).any(dim=2)
+
+        return marked
+
+    def grow(self, active):
+        """
+        add the (toroidal) 8-neighborhood of each active tile
+        """
+
+        grown = active | torch.roll(active, 1, dims=-1) \
+                | torch.roll(active, -1, dims=-1)
+
+        return grown | torch.roll(grown, 1, dims=-2) \
+                | torch.roll(grown, -1, dims=-2)
+
+    def step(self, universe, active, rule_table, rule_offsets=None):
+        """
+        advance `universe` one generation in place, recomputing only active
+        tiles and their neighbors. Returns the new active tile bitmap.
+        """
+
+        instance_index, tile_row, tile_col = \
+                torch.nonzero(self.grow(active), as_tuple=True)
+
+        active_1 = torch.zeros_like(active)
+
+        if instance_index.shape[0] == 0:
+            return active_1
+
+        tiles = instance_index.shape[0]
+
+        rows = (tile_row.unsqueeze(1) * self.tile_size + self.halo_range) \
+                % self.height
+        cols = (tile_col.unsqueeze(1) * self.tile_size + self.halo_range) \
+                % self.width
+
+        # gather tiles with a one-cell halo, wrapping around the torus
+        halo = universe[instance_index.reshape(-1, 1, 1), 0, \
+                rows.unsqueeze(2), cols.unsqueeze(1)].to(torch.uint8)
+
+        cells = halo[:, 1:-1, 1:-1]
+
+        neighbors = halo[:, :-2, :-2] + halo[:, :-2, 1:-1] + halo[:, :-2, 2:] \
+                + halo[:, 1:-1, :-2] + halo[:, 1:-1, 2:] \
+                + halo[:, 2:, :-2] + halo[:, 2:, 1:-1] + halo[:, 2:, 2:]
+
+        rule_index = (9 * cells + neighbors).long()
+
+        if rule_offsets is not None:
+            rule_index += rule_offsets.reshape(-1)[instance_index]\
+                    .reshape(tiles, 1, 1)
+
+        cells_1 = torch.take(rule_table, rule_index).to(universe.dtype)
+
+        active_1[instance_index, tile_row, tile_col] = \
+                (cells_1 != cells).reshape(tiles, -1).any(dim=1)
+
+        center_rows = tile_row.unsqueeze(1) * self.tile_size + self.tile_range
+        center_cols = tile_col.unsqueeze(1) * self.tile_size + self.tile_range
+
+        universe[instance_index.reshape(-1, 1, 1), 0, \
+                center_rows.unsqueeze(2), center_cols.unsqueeze(1)] = cells_1
+
+        return active_1
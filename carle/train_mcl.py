@@ -12,11 +12,21 @@ from carle.env import CARLE
 from carle.mcl import RND2D, AE2D
 from carle.agents import RandomAgent, RandomNetworkAgent
 
+def rules_to_string(ruleset):
+    """
+    convert a [[B],[S]] ruleset to a B/S rule string
+    """
+
+    return "B" + "".join([str(bb) for bb in ruleset[0]]) \
+            + "/S" + "".join([str(ss) for ss in ruleset[1]])
+
 def train(agent_fn,\
         instances=16,\
         steps=[64,2048],\
         rules=[[[3],[2,3]]],\
-        mcl=[RND2D, AE2D]):
+        mcl=[RND2D, AE2D],\
+        parallel_rules=False,\
+        timing=False):
     """
     train endogenous mcl reward wrappers (e.g. RND2D and AE2D)
 
@@ -27,9 +37,21 @@ def train(agent_fn,\
         rules - a list of lists outling B/S rules for CARLE. [[[B],[S]],[[B],[S]]] 
         mcl - a list of mcl wrappers to apply to CARLE. 
             These are applied sequentially and trained simultaneously
+        parallel_rules - run all rulesets at once in one wide batch 
+            (`instances` per ruleset) instead of one after another
+        timing - print a per-wrapper breakdown of step time after each
+            ruleset, and append it to ./logs/mcl/metrics/
 
     """
 
+    if parallel_rules:
+        rule_strings = [rules_to_string(ruleset) \
+                for ruleset in rules for ii in range(instances)]
+
+        instances = len(rule_strings)
+        rule_cycle = [rules]
+    else:
+        rule_cycle = rules
 
     env = CARLE(instances=instances, use_cuda=True)
 
@@ -46,15 +68,22 @@ def train(agent_fn,\
 
     exp_id = "mcl" + str(int(time.time()))
 
+    if timing:
+        timer = env.enable_timing(dump_path="./logs/mcl/metrics/timing_{}.jsonl"\
+                .format(exp_id))
+
     rewards = []
     t0 = time.time()
 
     for epoch in range(steps[0]):
 
-        for ruleset in rules:
+        for ruleset in rule_cycle:
 
-            env.inner_env.birth = ruleset[0]
-            env.inner_env.survive = ruleset[1]
+            if parallel_rules:
+                env.inner_env.rules_from_string(rule_strings)
+            else:
+                env.inner_env.birth = ruleset[0]
+                env.inner_env.survive = ruleset[1]
 
             obs = env.reset()
 
@@ -72,6 +101,11 @@ def train(agent_fn,\
             steps_per_second = (step * env.inner_env.instances) / (t2-t1)
 
             print("steps / second = {:.3f}".format(steps_per_second))
+
+            if timing:
+                print(timer.summary())
+                timer.dump()
+                timer.reset_counts()
             print("round {}, ruleset {}, mean reward = {:.3e}".format(\
                     epoch, ruleset, sum_reward/(step*instances)))
             print("saving mcl state dicts")
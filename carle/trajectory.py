@@ -0,0 +1,264 @@
+"""
+binary trajectory logs for CARLE
+
+    Trajectories store every instance's universe and action at every step.
+    Universes are bit-packed, and most steps are stored as the XOR with the
+    previous step (a delta), which is mostly zeros and compresses well.
+    Keyframes (complete universes) are written every `keyframe_interval`
+    steps, so a reader can seek to any step by decoding at most
+    `keyframe_interval` deltas.
+
+    File layout (little-endian):
+        header - b"CARLETRJ", then version, instances, height, width,
+            action_height, action_width, keyframe_interval
+        records - step, kind (0 keyframe, 1 delta), universe and action
+            byte counts, then zlib-compressed universe and action bits
+        index (written by `close`) - (step, offset, kind) for each record,
+            then index offset, record count and b"CARLEIDX"
+
+    Files without an index (e.g. from a run that is still going) are read by
+    scanning the records.
+"""
+
+import mmap
+import struct
+import zlib
+
+import numpy as np
+import torch
+
+MAGIC = b"CARLETRJ"
+INDEX_MAGIC = b"CARLEIDX"
+VERSION = 1
+
+HEADER = struct.Struct("<8sHIIIIII")
+RECORD = struct.Struct("<QBII")
+FOOTER = struct.Struct("<QQ8s")
+
+KEYFRAME = 0
+DELTA = 1
+
+
+def pack_cells(cells):
+    """
+    bit-pack a tensor or array of cells, any nonzero value is alive
+    """
+
+    if isinstance(cells, torch.Tensor):
+        cells = cells.detach().cpu().numpy()
+
+    return np.packbits(np.asarray(cells) != 0)
+
+class TrajectoryWriter():
+
+    def __init__(self, filepath, instances, height, width, \
+            action_height=64, action_width=64, keyframe_interval=64):
+
+        self.filepath = filepath
+        self.instances = instances
+        self.height = height
+        self.width = width
+        self.action_height = action_height
+        self.action_width = action_width
+        self.keyframe_interval = keyframe_interval
+
+        self.file = open(filepath, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, instances, height, width, \
+                action_height, action_width, keyframe_interval))
+
+        self.index = []
+        self.last_universe = None
+
+    def append(self, universe, action, step):
+        """
+        add one step for all instances
+
+            universe - (instances, 1, height, width) tensor or array
+            action - (instances or 1, 1, action_height, action_width) actions,
+                or full-size (..., height, width) actions, which are cropped
+                to the centered action window (as CARLE.apply_action does)
+            step - the environment's step number
+        """
+
+        if isinstance(action, torch.Tensor):
+            action = action.detach().cpu().numpy()
+
+        action = np.asarray(action)
+
+        if action.shape[-2:] == (self.height, self.width) \
+                and action.shape[-2:] != (self.action_height, self.action_width):
+            top = (self.height - self.action_height) // 2
+            left = (self.width - self.action_width) // 2
+
+            action = action[..., top:top + self.action_height, \
+                    left:left + self.action_width]
+
+        action = np.broadcast_to(np.asarray(action).reshape(-1, \
+                self.action_height, self.action_width), \
+                (self.instances, self.action_height, self.action_width))
+
+        packed_universe = pack_cells(universe)
+
+        if len(self.index) % self.keyframe_interval == 0:
+            kind = KEYFRAME
+            universe_bytes = packed_universe
+        else:
+            kind = DELTA
+            universe_bytes = np.bitwise_xor(packed_universe, self.last_universe)
+
+        self.last_universe = packed_universe
+
+        universe_bytes = zlib.compress(universe_bytes.tobytes(), 1)
+        action_bytes = zlib.compress(pack_cells(action).tobytes(), 1)
+
+        self.index.append((step, self.file.tell(), kind))
+
+        self.file.write(RECORD.pack(step, kind, \
+                len(universe_bytes), len(action_bytes)))
+        self.file.write(universe_bytes)
+        self.file.write(action_bytes)
+
+    def flush(self):
+
+        self.file.flush()
+
+    def close(self):
+
+        if self.file.closed:
+            return
+
+        index_offset = self.file.tell()
+
+        self.file.write(np.array(self.index, dtype=np.uint64)\
+                .reshape(-1, 3).tobytes())
+        self.file.write(FOOTER.pack(index_offset, len(self.index), INDEX_MAGIC))
+
+        self.file.close()
+
+class TrajectoryReader():
+
+    def __init__(self, filepath):
+
+        self.file = open(filepath, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.instances, self.height, self.width, \
+                self.action_height, self.action_width, \
+                self.keyframe_interval = HEADER.unpack_from(self.data, 0)
+
+        assert magic == MAGIC, f"{filepath} is not a CARLE trajectory"
+
+        self.universe_bits = self.instances * self.height * self.width
+        self.action_bits = self.instances * self.action_height * self.action_width
+
+        if self.data[-len(INDEX_MAGIC):] == INDEX_MAGIC:
+            index_offset, count, _ = FOOTER.unpack_from(self.data, \
+                    len(self.data) - FOOTER.size)
+
+            # copied, so that the map can be closed
+            self.index = np.frombuffer(self.data, dtype=np.uint64, \
+                    count=3 * count, offset=index_offset).reshape(-1, 3).copy()
+        else:
+            self.index = self.scan()
+
+        self.steps = self.index[:, 0]
+        self.keyframes = np.flatnonzero(self.index[:, 2] == KEYFRAME)
+
+        # the most recently decoded (record, packed universe), for fast
+        # sequential reads
+        self.last_decoded = None
+
+    def scan(self):
+        """
+        rebuild the record index of a file that wasn't closed
+        """
+
+        index = []
+        offset = HEADER.size
+
+        while offset + RECORD.size <= len(self.data):
+
+            step, kind, universe_length, action_length = \
+                    RECORD.unpack_from(self.data, offset)
+
+            end = offset + RECORD.size + universe_length + action_length
+
+            if end > len(self.data):
+                break
+
+            index.append((step, offset, kind))
+            offset = end
+
+        return np.array(index, dtype=np.uint64).reshape(-1, 3)
+
+    def __len__(self):
+
+        return self.index.shape[0]
+
+    def read_record(self, record):
+
+        offset = int(self.index[record, 1])
+
+        step, kind, universe_length, action_length = \
+                RECORD.unpack_from(self.data, offset)
+
+        start = offset + RECORD.size
+
+        universe_bytes = zlib.decompress(self.data[start:start + universe_length])
+        action_bytes = zlib.decompress(self.data[start + universe_length:\
+                start + universe_length + action_length])
+
+        return kind, np.frombuffer(universe_bytes, dtype=np.uint8), \
+                np.frombuffer(action_bytes, dtype=np.uint8)
+
+    def read(self, record):
+        """
+        decode record number `record` (not the step number, see `find_step`)
+
+        returns universe (instances, 1, height, width) and
+        action (instances, 1, action_height, action_width) uint8 arrays,
+        and the step number
+        """
+
+        keyframe = self.keyframes[np.searchsorted(self.keyframes, record, \
+                side="right") - 1]
+
+        # continue from the last decoded record if it's on the way
+        if self.last_decoded is not None \
+                and keyframe <= self.last_decoded[0] <= record:
+            start, packed = self.last_decoded
+            start += 1
+        else:
+            start, packed = keyframe, None
+
+        for kk in range(start, record + 1):
+            kind, universe_bytes, action_bytes = self.read_record(kk)
+
+            if kind == KEYFRAME:
+                packed = universe_bytes
+            else:
+                packed = np.bitwise_xor(packed, universe_bytes)
+
+        if start > record:
+            action_bytes = self.read_record(record)[2]
+
+        self.last_decoded = (record, packed)
+
+        universe = np.unpackbits(packed, count=self.universe_bits)\
+                .reshape(self.instances, 1, self.height, self.width)
+        action = np.unpackbits(action_bytes, count=self.action_bits)\
+                .reshape(self.instances, 1, self.action_height, self.action_width)
+
+        return universe, action, int(self.steps[record])
+
+    def find_step(self, step):
+        """
+        record number of the first record at or after `step`
+        """
+
+        return int(np.searchsorted(self.steps, step))
+
+    def close(self):
+
+        self.data.close()
+        self.file.close()
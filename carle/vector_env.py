@@ -0,0 +1,238 @@
+"""
+multiprocess vector environment for CARLE
+
+    VectorCARLE shards instances across worker processes, each owning its own
+    CARLE (plus any wrapper stack). Actions, observations, rewards and done
+    flags are exchanged through shared-memory tensors, with actions and
+    observations bit-packed (8 cells per byte). Only short commands go
+    through the pipes.
+"""
+
+import os
+
+import torch
+import torch.multiprocessing as mp
+
+from carle.env import CARLE
+
+# bit weights, most significant first (as numpy.packbits)
+BIT_WEIGHTS = torch.tensor([128, 64, 32, 16, 8, 4, 2, 1], dtype=torch.uint8)
+
+
+def pack_bits(cells, out=None):
+    """
+    pack binary cells (..., width) into uint8 (..., width // 8)
+    """
+
+    cells = (cells != 0).to(torch.uint8)
+    cells = cells.reshape(*cells.shape[:-1], cells.shape[-1] // 8, 8)
+
+    packed = torch.sum(cells * BIT_WEIGHTS, dim=-1, dtype=torch.uint8)
+
+    if out is None:
+        return packed
+
+    return out.copy_(packed)
+
+def unpack_bits(packed, dtype=torch.float32):
+    """
+    unpack uint8 (..., width // 8) into cells (..., width)
+    """
+
+    cells = (packed.unsqueeze(-1) & BIT_WEIGHTS) != 0
+
+    return cells.reshape(*packed.shape[:-1], packed.shape[-1] * 8).to(dtype)
+
+def worker(env_fn, env_kwargs, start, end, buffers, connection, cpus, threads):
+
+    torch.set_num_threads(threads)
+
+    if cpus is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+
+    env = env_fn(instances=end - start, **env_kwargs)
+
+    actions = buffers["actions"][start:end]
+    observations = buffers["observations"][start:end]
+    reward = buffers["reward"][start:end]
+    done = buffers["done"][start:end]
+
+    packed = buffers["packed"]
+
+    def write_observation(obs):
+
+        if packed:
+            pack_bits(obs.cpu(), out=observations)
+        else:
+            observations.copy_(obs.detach())
+
+    while True:
+
+        command = connection.recv()
+
+        if command == "step":
+            action = unpack_bits(actions) if packed else actions
+
+            obs, step_reward, step_done, info = env.step(action)
+
+            write_observation(obs)
+            reward.copy_(step_reward.detach().reshape(-1, 1))
+            done.copy_(step_done.detach().reshape(-1, 1))
+
+        elif command == "reset":
+            write_observation(env.reset())
+
+        elif command == "close":
+            connection.send("closed")
+            break
+
+        connection.send("ok")
+
+    connection.close()
+
+class VectorCARLE():
+
+    def __init__(self, **kwargs):
+        """
+            instances - total number of instances, default 1
+            workers - number of worker processes, default 2
+            env_fn - callable that builds a worker's environment from
+                instances=... and env_kwargs (e.g. CARLE, or a function that
+                wraps CARLE in Motivators). Must be picklable, i.e. defined at
+                module level. Default CARLE
+            env_kwargs - extra keyword arguments for env_fn
+            threads - torch intra-op threads per worker, default 1
+            pin - pin each worker to its own `threads` cores, default True
+            packed - bit-pack observations and actions, default True
+                (observations must be binary)
+        """
+
+        self.instances = kwargs.get("instances", 1)
+        self.workers = kwargs.get("workers", 2)
+        self.env_fn = kwargs.get("env_fn", CARLE)
+        self.env_kwargs = kwargs.get("env_kwargs", {})
+        self.threads = kwargs.get("threads", 1)
+        self.pin = kwargs.get("pin", True)
+        self.packed = kwargs.get("packed", True)
+
+        assert self.workers <= self.instances, \
+                f"{self.workers} workers need at least as many instances"
+
+        # read sizes from a single-instance environment (in this process)
+        probe = self.env_fn(instances=1, **self.env_kwargs)
+        self.inner_env = probe if probe.inner_env is None else probe.inner_env
+
+        self.height = self.inner_env.height
+        self.width = self.inner_env.width
+        self.action_height = self.inner_env.action_height
+        self.action_width = self.inner_env.action_width
+
+        if self.packed:
+            assert self.width % 8 == 0 and self.action_width % 8 == 0, \
+                    "packed observations and actions need widths divisible by 8"
+
+            observation_shape = (self.instances, 1, self.height, self.width // 8)
+            action_shape = (self.instances, 1, self.action_height, \
+                    self.action_width // 8)
+            dtype = torch.uint8
+        else:
+            observation_shape = (self.instances, 1, self.height, self.width)
+            action_shape = (self.instances, 1, self.action_height, \
+                    self.action_width)
+            dtype = torch.float32
+
+        self.buffers = {"observations": torch.zeros(observation_shape, \
+                    dtype=dtype).share_memory_(), \
+                "actions": torch.zeros(action_shape, dtype=dtype).share_memory_(), \
+                "reward": torch.zeros(self.instances, 1).share_memory_(), \
+                "done": torch.zeros(self.instances, 1).share_memory_(), \
+                "packed": self.packed}
+
+        # contiguous shards, the first `instances % workers` one larger
+        shard = self.instances // self.workers
+        extra = self.instances % self.workers
+        bounds = [0]
+        for ii in range(self.workers):
+            bounds.append(bounds[-1] + shard + (ii < extra))
+
+        if self.pin and hasattr(os, "sched_getaffinity"):
+            cores = sorted(os.sched_getaffinity(0))
+        else:
+            cores = None
+
+        context = mp.get_context("spawn")
+
+        self.connections = []
+        self.processes = []
+        for ii in range(self.workers):
+
+            if cores is None:
+                cpus = None
+            else:
+                cpus = [cores[(ii * self.threads + jj) % len(cores)] \
+                        for jj in range(self.threads)]
+
+            parent, child = context.Pipe()
+
+            process = context.Process(target=worker, \
+                    args=(self.env_fn, self.env_kwargs, \
+                    bounds[ii], bounds[ii + 1], self.buffers, child, cpus, \
+                    self.threads), daemon=True)
+            process.start()
+
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def send(self, command):
+
+        for connection in self.connections:
+            connection.send(command)
+
+        for connection in self.connections:
+            assert connection.recv() == "ok", f"worker failed on {command}"
+
+    def get_observation(self):
+
+        if self.packed:
+            return unpack_bits(self.buffers["observations"])
+
+        return self.buffers["observations"].clone()
+
+    def reset(self):
+
+        self.send("reset")
+
+        return self.get_observation()
+
+    def step(self, action):
+
+        if not isinstance(action, torch.Tensor):
+            action = torch.Tensor(action)
+
+        action = action.reshape(-1, 1, self.action_height, self.action_width)\
+                .expand(self.instances, -1, -1, -1)
+
+        if self.packed:
+            pack_bits(action, out=self.buffers["actions"])
+        else:
+            self.buffers["actions"].copy_(action)
+
+        self.send("step")
+
+        reward = self.buffers["reward"].clone()
+        done = self.buffers["done"].clone()
+        info = [{}] * self.instances
+
+        return self.get_observation(), reward, done, info
+
+    def close(self):
+
+        for connection in self.connections:
+            connection.send("close")
+
+        for connection, process in zip(self.connections, self.processes):
+            connection.recv()
+            process.join()
+
+        self.connections = []
+        self.processes = []
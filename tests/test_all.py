@@ -1,7 +1,18 @@
 import unittest
 
-from tests.test_env import TestEnv
-from tests.test_mcl import TestParsimonyBonus, TestPredictionBonus
+from tests.test_env import TestEnv, TestStorage, TestBitBoard, \
+        TestActiveTiles
+from tests.test_hashlife import TestHashLife
+from tests.test_trajectory import TestTrajectory
+from tests.test_sink import TestAsyncSink
+from tests.test_recorder import TestFrameRecorder
+from tests.test_terminal import TestTerminalRenderer
+from tests.test_vector_env import TestVectorCARLE
+from tests.test_pipeline import TestPipeline
+from tests.test_benchmark import TestBenchmark
+from tests.test_instrumentation import TestStepTimer
+from tests.test_mcl import TestParsimonyBonus, TestPredictionBonus, \
+        TestFusedDetectors, TestPufferDetector, TestSpeedDetector
 
 if __name__ == "__main__":
 
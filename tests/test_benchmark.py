@@ -0,0 +1,52 @@
+import copy
+import json
+import unittest
+
+import numpy as np
+import torch
+
+from carle.benchmark import run, compare, METRICS
+
+class TestBenchmark(unittest.TestCase):
+
+    def setUp(self):
+
+        np.random.seed(42)
+        torch.random.manual_seed(42)
+
+    def test_run(self):
+        """
+        Test a small sweep, its JSON round trip and baseline comparison
+        """
+
+        results = run(instances=[1, 2], sizes=[64], backends=["conv", "bitboard"], \
+                steps=4, warmup=1)
+        results = json.loads(json.dumps(results))
+
+        self.assertEqual(4, len(results["results"]))
+
+        for result in results["results"]:
+            for metric in METRICS:
+                self.assertGreater(result[metric], 0.0)
+
+            self.assertLessEqual(result["p50_latency"], result["p99_latency"])
+            self.assertTrue(result["isolated"])
+
+        self.assertEqual([], compare(results, results))
+
+        baseline = copy.deepcopy(results)
+        baseline["results"][0]["steps_per_second"] *= 2.0
+
+        regressions = compare(results, baseline, tolerance=0.1)
+
+        self.assertEqual(1, len(regressions))
+        self.assertEqual((1, 64, "B3/S23", "conv"), regressions[0][0])
+
+        results = run(instances=[1], sizes=[64], steps=4, warmup=1, \
+                isolate=False)
+
+        self.assertFalse(results["results"][0]["isolated"])
+
+if __name__ == "__main__":
+
+    unittest.main(verbosity=2)
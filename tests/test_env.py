@@ -1,9 +1,13 @@
+import os
 import unittest
 
 import numpy as np
 import torch
 
+import carle.env
 from carle.env import CARLE
+from carle.rle import decode_rle
+from carle.tiles import ActiveTiles
 
 class TestEnv(unittest.TestCase):
 
@@ -39,6 +43,165 @@ class TestEnv(unittest.TestCase):
         self.assertEqual(s_target, self.env.survive)
 
 
+    def test_rule_table(self):
+        """
+        Test that rules compile to a next-state table that is cached
+        per rule string and follows direct assignment of birth/survive
+        """
+
+        self.env.rules_from_string("B3678/S34678")
+        day_and_night = self.env.rule_table
+
+        self.assertEqual([0., 0., 0., 1., 0., 0., 1., 1., 1.], \
+                day_and_night[:9].tolist())
+        self.assertEqual([0., 0., 0., 1., 1., 0., 1., 1., 1.], \
+                day_and_night[9:].tolist())
+
+        self.env.rules_from_string("B3/S23")
+        self.env.rules_from_string("B3678/S34678")
+
+        self.assertIs(day_and_night, self.env.rule_table)
+
+        _ = self.env.reset()
+        self.env.birth = [3]
+        self.env.survive = [2,3]
+
+        action = torch.zeros(self.env.instances, 1,\
+            self.env.action_height, self.env.action_width)
+        _ = self.env.step(action)
+
+        self.assertEqual("B3/S23", self.env.rule_string)
+
+    def test_instance_rules(self):
+        """
+        Test that each instance in a batch can follow its own rule
+        """
+
+        my_rules = ["B3/S23", "B368/S245", "B3678/S34678", "B3/S023"]
+
+        soup = 1.0 * (torch.rand(1, 1, 256, 256) < 0.25)
+
+        for engine in ["conv", "bitboard"]:
+            for dtype in ["float32", "uint8"]:
+
+                batch_env = CARLE(instances=4, engine=engine, storage_dtype=dtype)
+                batch_env.rules_from_string(my_rules)
+                _ = batch_env.reset()
+                batch_env.universe = soup.repeat(4, 1, 1, 1).to(batch_env.storage_dtype)
+
+                self.assertEqual([3], batch_env.birth)
+                self.assertEqual([2,3], batch_env.survive)
+
+                batch_obs = batch_env.rollout(4)[0]
+
+                for ii, rules in enumerate(my_rules):
+                    env = CARLE()
+                    env.rules_from_string(rules)
+                    _ = env.reset()
+                    env.universe = soup.clone()
+
+                    obs = env.rollout(4)[0]
+
+                    self.assertEqual(0.0, \
+                            (obs[0] - batch_obs[ii]).abs().sum().item())
+
+    def test_rollout(self):
+        """
+        Test that a rollout matches the same number of single steps
+        """
+
+        step_env = CARLE(instances=2)
+        rollout_env = CARLE(instances=2)
+
+        _ = step_env.reset()
+        _ = rollout_env.reset()
+
+        actions = torch.zeros(6, 2, 1, step_env.action_height, \
+                step_env.action_width)
+        actions[0] = 1.0 * (torch.rand(2, 1, step_env.action_height, \
+                step_env.action_width) < 0.2)
+
+        for tt in range(6):
+            obs = step_env.step(actions[tt])[0]
+
+        rollout_obs = rollout_env.rollout(actions)[0]
+
+        self.assertEqual(0.0, (obs - rollout_obs).abs().sum().item())
+
+        for tt in range(4):
+            obs = step_env.step(actions[-1])[0]
+
+        frames = rollout_env.rollout(4, stride=2)[0]
+
+        self.assertEqual(2, frames.shape[0])
+        self.assertEqual(0.0, (obs - frames[-1]).abs().sum().item())
+        self.assertEqual(10, rollout_env.step_number)
+
+        # a stride longer than the rollout would give no frames
+        with self.assertRaises(AssertionError):
+            _ = rollout_env.rollout(2, stride=3)
+
+        self.assertEqual(1, rollout_env.rollout(2, stride=2)[0].shape[0])
+
+    def test_rle(self):
+        """
+        Test that encoding a universe as rle and reading it back gives the
+        same universe, for single instances and batches
+        """
+
+        env = CARLE(instances=3)
+        env.rules_from_string(["B3/S23", "B36/S23", "B3678/S34678"])
+        _ = env.reset()
+
+        env.universe = 1.0 * (torch.rand(3, 1, 256, 256) < 0.3)
+        env.universe[:, :, -1, -3:] = 1.0
+
+        rle = env.get_rle(env.universe[0,0,:,:])
+        rle_batch = env.get_rle_batch()
+
+        self.assertEqual(rle, rle_batch[0])
+        self.assertIn("rule = B36/S23:T256, 256", rle_batch[1])
+
+        for ii, my_rle in enumerate(rle_batch):
+            lines = my_rle.split("\n")
+
+            self.assertTrue(max([len(line) for line in lines[3:]]) < 80)
+
+            grid = env.rle_to_grid("\n".join(lines[3:]))
+
+            self.assertEqual(0.0, \
+                    (grid - env.universe[ii, 0]).abs().sum().item())
+
+    def test_load_universe_batch(self):
+        """
+        Test seeding several instances from rle files and strings at once,
+        with placement offsets that wrap around the torus
+        """
+
+        file_path = os.path.join(os.path.split(\
+                os.path.abspath(carle.env.__file__))[0], "spaceship_duck.rle")
+
+        glider = "#C a glider\nx = 3, y = 3, rule = B3/S23\nbo$2bo$3o!"
+
+        env = CARLE(instances=4)
+        _ = env.reset()
+
+        env.load_universe_batch([file_path, glider, glider], indices=[0, 2, 3], \
+                offsets=[(0, 0), "center", (255, 255)])
+
+        self.assertEqual([15.0, 0.0, 5.0, 5.0], \
+                env.universe.sum(dim=[1,2,3]).tolist())
+
+        self.assertEqual(1.0, env.universe[2, 0, 126, 127].item())
+
+        for row, col in [[255, 0], [0, 1], [1, 255], [1, 0], [1, 1]]:
+            self.assertEqual(1.0, env.universe[3, 0, row, col].item())
+
+        cells, info = decode_rle(glider)
+
+        self.assertEqual("B3/S23", info["rule"])
+        self.assertEqual((3, 3), cells.shape)
+
     def test_reset(self):
         """
         Test CARLE's master toggle functionality, where an agent can reset
@@ -66,6 +229,382 @@ class TestEnv(unittest.TestCase):
         self.assertNotEqual(1.0, \
             (1.0 * (toggle_observation == normal_observation)).mean().item())
 
+    def test_instance_reset(self):
+        """
+        Test that toggling every cell only clears that instance, for each
+        engine, and that steps since action are counted per instance
+        """
+
+        for engine in ["conv", "bitboard", "tiles"]:
+
+            env = CARLE(instances=3, height=128, width=128, engine=engine)
+            _ = env.reset()
+
+            action = 1.0 * (torch.rand(3, 1, env.action_height, \
+                    env.action_width) < 0.3)
+
+            obs = env.step(action)[0]
+            obs = env.step(0 * action)[0]
+
+            action[1] = 1.0
+            action[2] = 0.0
+
+            obs = env.step(action)[0]
+
+            self.assertEqual(0.0, obs[1].sum().item())
+            self.assertNotEqual(0.0, obs[0].sum().item())
+            self.assertNotEqual(0.0, obs[2].sum().item())
+
+            self.assertEqual([0, 0, 2], env.steps_since_action.tolist())
+            self.assertEqual(3, env.step_number)
+
+    def test_reset_instances(self):
+        """
+        Test that masked resets leave the other instances running,
+        and that instances are autoreset after `max_steps` of their own
+        """
+
+        for engine in ["conv", "bitboard", "tiles"]:
+
+            env = CARLE(instances=3, height=128, width=128, engine=engine, \
+                    max_steps=4, alive_rate=0.2)
+            obs = env.reset()
+
+            # full resets are seeded like per-instance resets
+            self.assertAlmostEqual(0.2, obs.mean().item(), places=1)
+
+            action = 1.0 * (torch.rand(3, 1, env.action_height, \
+                    env.action_width) < 0.3)
+
+            obs, reward, done, info = env.step(action)
+            before = obs.clone()
+
+            obs = env.reset_instances([1])
+
+            self.assertEqual(0.0, (before[0] - obs[0]).abs().sum().item())
+            self.assertEqual(0.0, (before[2] - obs[2]).abs().sum().item())
+            self.assertNotEqual(0.0, (before[1] - obs[1]).abs().sum().item())
+            self.assertAlmostEqual(0.2, obs[1].mean().item(), places=1)
+
+            self.assertEqual([1, 0, 1], env.instance_steps.tolist())
+
+            dones = []
+            for step in range(3):
+                obs, reward, done, info = env.step(0 * action)
+                dones.append(done.reshape(-1).tolist())
+
+            self.assertEqual([[0, 0, 0], [0, 0, 0], [1, 0, 1]], dones)
+            self.assertEqual([0, 3, 0], env.instance_steps.tolist())
+
+    def test_action_shapes(self):
+        """
+        Test that 2D and 3D actions step like the same 4D action
+        """
+
+        action = 1.0 * (torch.rand(1, 1, 64, 64) < 0.3)
+
+        observations = []
+        for my_action in [action, action[0], action[0, 0]]:
+            env = CARLE(instances=2, height=128, width=128)
+            _ = env.reset()
+
+            obs = env.step(my_action)[0]
+            obs = env.step(0 * my_action)[0]
+
+            self.assertEqual([1, 1], env.steps_since_action.tolist())
+            observations.append(obs)
+
+        for obs in observations[1:]:
+            self.assertEqual(0.0, (observations[0] - obs).abs().sum().item())
+
+    def test_non_square(self):
+        """
+        Test that actions land in the center of non-square universes,
+        for window-size and full-size actions
+        """
+
+        configs = [{"engine": "conv"}, {"engine": "conv", "preallocate": True}, \
+                {"engine": "bitboard"}, {"engine": "tiles"}]
+
+        for config in configs:
+
+            env = CARLE(instances=2, height=64, width=128, \
+                    action_height=16, action_width=32, **config)
+            env.rules_from_string("B3/S23")
+
+            self.assertEqual((2, 1, 64, 128), env.reset().shape)
+
+            # a block (still life) in the top-left corner of the action window
+            action = torch.zeros(2, 1, 16, 32)
+            action[:, :, :2, :2] = 1.0
+
+            full_action = torch.zeros(2, 1, 64, 128)
+            full_action[:, :, 24:26, 48:50] = 1.0
+
+            for my_action in [action, full_action]:
+                _ = env.reset()
+
+                obs = env.step(my_action)[0]
+
+                self.assertEqual(8.0, obs.sum().item())
+                self.assertEqual(8.0, obs[:, :, 24:26, 48:50].sum().item())
+
+class TestStorage(unittest.TestCase):
+
+    def setUp(self):
+
+        np.random.seed(42)
+        torch.random.manual_seed(42)
+
+    def test_integer_storage(self):
+        """
+        Test that uint8 and bool universes evolve like float32 universes,
+        and that observations are still float32
+        """
+
+        soup = 1.0 * (torch.rand(2, 1, 128, 128) < 0.3)
+
+        for rules in ["B3/S23", "B3678/S34678"]:
+            envs = [CARLE(instances=2, height=128, width=128, \
+                    storage_dtype=dtype) for dtype in ["float32", "uint8", "bool"]]
+
+            action = torch.zeros(2, 1, envs[0].action_height, \
+                    envs[0].action_width)
+            action[:, :, 30:34, 30:34] = 1.0
+
+            observations = []
+            for env in envs:
+                env.rules_from_string(rules)
+                _ = env.reset()
+                env.universe = soup.to(env.storage_dtype)
+
+                obs = env.step(action)[0]
+                for step in range(6):
+                    obs = env.step(0 * action)[0]
+
+                observations.append(obs)
+
+            self.assertEqual(torch.uint8, envs[1].universe.dtype)
+            self.assertEqual(torch.bool, envs[2].universe.dtype)
+
+            for obs in observations[1:]:
+                self.assertEqual(torch.float32, obs.dtype)
+                self.assertEqual(0.0, \
+                        (observations[0] - obs).abs().sum().item())
+
+    def test_preallocate(self):
+        """
+        Test that in-place stepping matches the default step,
+        and that reward and done buffers are reused
+        """
+
+        soup = 1.0 * (torch.rand(2, 1, 128, 128) < 0.3)
+
+        for dtype in ["float32", "uint8", "bool"]:
+            for rules in ["B3/S23", ["B3/S23", "B36/S23"]]:
+
+                envs = [CARLE(instances=2, height=128, width=128, \
+                        storage_dtype=dtype, preallocate=preallocate) \
+                        for preallocate in [False, True]]
+
+                action = torch.zeros(1, 1, envs[0].action_height, \
+                        envs[0].action_width)
+                action[:, :, 30:34, 30:36] = 1.0
+
+                observations = []
+                for env in envs:
+                    env.rules_from_string(rules)
+                    _ = env.reset()
+                    env.universe = soup.clone().to(env.storage_dtype)
+
+                    obs, reward, done, info = env.step(action)
+                    for step in range(6):
+                        obs, reward_1, done_1, info = env.step(0 * action)
+
+                    observations.append(obs.clone())
+
+                self.assertEqual(0.0, \
+                        (observations[0] - observations[1]).abs().sum().item())
+
+                self.assertTrue(reward is reward_1)
+                self.assertTrue(done is done_1)
+                self.assertEqual(0, info["reset"].sum().item())
+
+                _, _, _, info = env.step(torch.ones_like(action))
+                self.assertEqual(2, info["reset"].sum().item())
+
+    def test_preallocate_observation(self):
+        """
+        Test that observations kept across steps don't change when
+        universes are stepped in place
+        """
+
+        soup = 1.0 * (torch.rand(2, 1, 128, 128) < 0.3)
+
+        for dtype in ["float32", "uint8", "bool"]:
+
+            env = CARLE(instances=2, height=128, width=128, \
+                    storage_dtype=dtype, preallocate=True)
+            _ = env.reset()
+            env.universe = soup.clone().to(env.storage_dtype)
+
+            action = torch.zeros(1, 1, env.action_height, env.action_width)
+            action[:, :, 30:34, 30:36] = 1.0
+
+            obs = env.step(action)[0]
+            kept = obs.clone()
+
+            _ = env.step(action)
+            _ = env.step(action)
+
+            self.assertEqual(0.0, (obs - kept).abs().sum().item())
+
+    def test_compile(self):
+        """
+        Test that the compiled (or eager fallback) fused step matches the
+        default step, across rule changes and per-instance rules
+        """
+
+        soup = 1.0 * (torch.rand(2, 1, 64, 64) < 0.3)
+
+        for dtype in ["float32", "uint8"]:
+
+            envs = [CARLE(instances=2, height=64, width=64, action_height=16, \
+                    action_width=16, storage_dtype=dtype, compile=compile) \
+                    for compile in [False, True]]
+
+            for rules in ["B3/S23", "B36/S23", ["B3/S23", "B3678/S34678"]]:
+
+                observations = []
+                for env in envs:
+                    env.rules_from_string(rules)
+                    _ = env.reset()
+                    env.universe = soup.clone().to(env.storage_dtype)
+
+                    observations.append(env.rollout(4)[0])
+
+                self.assertEqual(0.0, \
+                        (observations[0] - observations[1]).abs().sum().item())
+
+            # B3/S23 and B36/S23 share a compiled variant
+            self.assertLessEqual(len(envs[1].compiled_steps), 2)
+
+class TestBitBoard(unittest.TestCase):
+
+    def setUp(self):
+
+        np.random.seed(42)
+        torch.random.manual_seed(42)
+
+    def test_matches_conv(self):
+        """
+        Test that the bit-packed engine follows the conv engine for
+        several rules, including wrap-around at the universe edges
+        """
+
+        for rules in ["B3/S23", "B368/S245", "B3678/S34678", "B2/S0"]:
+
+            conv_env = CARLE(instances=3, height=128, width=128)
+            bit_env = CARLE(instances=3, height=128, width=128, engine="bitboard")
+
+            conv_env.rules_from_string(rules)
+            bit_env.rules_from_string(rules)
+
+            _ = conv_env.reset()
+            _ = bit_env.reset()
+
+            soup = 1.0 * (torch.rand(3, 1, 128, 128) < 0.3)
+            conv_env.universe = soup.clone()
+            bit_env.universe = soup.clone()
+
+            action = torch.zeros(3, 1, conv_env.action_height, \
+                    conv_env.action_width)
+
+            for step in range(8):
+                conv_obs = conv_env.step(action)[0]
+                bit_obs = bit_env.step(action)[0]
+
+                self.assertEqual(bit_obs.dtype, torch.float32)
+                self.assertEqual(0.0, (conv_obs - bit_obs).abs().sum().item())
+
+class TestActiveTiles(unittest.TestCase):
+
+    def setUp(self):
+
+        np.random.seed(42)
+        torch.random.manual_seed(42)
+
+    def test_matches_conv(self):
+        """
+        Test that the active-tile engine follows the conv engine, and that
+        tiles far from any activity are not active
+        """
+
+        for dtype in ["float32", "bool"]:
+            conv_env = CARLE(instances=2)
+            tile_env = CARLE(instances=2, engine="tiles", storage_dtype=dtype)
+
+            conv_env.rules_from_string(["B3/S23", "B36/S23"])
+            tile_env.rules_from_string(["B3/S23", "B36/S23"])
+
+            _ = conv_env.reset()
+            _ = tile_env.reset()
+
+            action = 1.0 * (torch.rand(2, 1, conv_env.action_height, \
+                    conv_env.action_width) < 0.3)
+
+            for step in range(24):
+                conv_obs = conv_env.step(action * (step % 8 == 0))[0]
+                tile_obs = tile_env.step(action * (step % 8 == 0))[0]
+
+                self.assertEqual(0.0, (conv_obs - tile_obs).abs().sum().item())
+
+            self.assertEqual((2, 16, 16), tuple(tile_env.active_tiles.shape))
+            self.assertFalse(tile_env.active_tiles[:, 0, 0].any().item())
+
+    def test_mark_window(self):
+        """
+        Test that marking an action window matches marking the padded action
+        """
+
+        tiles = ActiveTiles(64, 64, tile_size=16)
+
+        window = 1.0 * (torch.rand(2, 1, 20, 36) < 0.02)
+        padded = torch.zeros(2, 1, 64, 64)
+        padded[:, :, 10:30, 7:43] = window
+
+        self.assertTrue(torch.equal(tiles.mark(padded), \
+                tiles.mark_window(window, 10, 7)))
+
+    def test_rule_change(self):
+        """
+        Test that changing the rule re-evaluates tiles that were static
+        """
+
+        for engine in ["conv", "tiles"]:
+            env = CARLE(instances=1, engine=engine)
+            env.rules_from_string("B3/S23")
+
+            _ = env.reset()
+
+            # a block, still under B3/S23
+            universe = torch.zeros(1, 1, env.height, env.width)
+            universe[:, :, 8:10, 8:10] = 1.0
+            env.universe = universe.to(env.storage_dtype)
+
+            action = torch.zeros(1, 1, env.action_height, env.action_width)
+
+            for step in range(4):
+                obs = env.step(action)[0]
+
+            self.assertEqual(4.0, obs.sum().item())
+
+            # with B2 each side of the block has two cells giving birth
+            env.rules_from_string("B2/S23")
+            obs = env.step(action)[0]
+
+            self.assertEqual(12.0, obs.sum().item())
+
 if __name__ == "__main__":
 
     unittest.main(verbosity=2)
@@ -0,0 +1,83 @@
+import unittest
+
+import numpy as np
+import torch
+
+from carle.env import CARLE
+from carle.hashlife import HashLife
+from carle.mcl import get_glider
+
+class TestHashLife(unittest.TestCase):
+
+    def setUp(self):
+
+        np.random.seed(42)
+        torch.random.manual_seed(42)
+
+    def test_soup(self):
+        """
+        Test that HashLife matches dense stepping for random soups,
+        including a non-square universe and a B0 rule
+        """
+
+        for rules in ["B3/S23", "B3678/S34678", "B2/S0", "B0/S8"]:
+            for height, width in [[64, 64], [32, 64]]:
+
+                env = CARLE(height=height, width=width, \
+                        action_height=16, action_width=16)
+                env.rules_from_string(rules)
+                _ = env.reset()
+
+                soup = 1.0 * (torch.rand(1, 1, height, width) < 0.3)
+                env.universe = soup.clone()
+
+                target = env.rollout(37)[0]
+
+                hashlife = HashLife(env.birth, env.survive)
+                result = hashlife.advance(soup[0, 0].numpy(), 37)
+
+                self.assertEqual(0, np.abs(target[0, 0].numpy() - result).sum())
+
+    def test_small_cache(self):
+        """
+        Test that jumps that outgrow a small cache are retried correctly,
+        and that numpy integer generations are accepted
+        """
+
+        env = CARLE(height=64, width=64, action_height=16, action_width=16)
+        env.rules_from_string("B3/S23")
+        _ = env.reset()
+
+        soup = 1.0 * (torch.rand(1, 1, 64, 64) < 0.3)
+        env.universe = soup.clone()
+
+        target = env.rollout(37)[0]
+
+        hashlife = HashLife(env.birth, env.survive, max_nodes=512)
+        result = hashlife.advance(soup[0, 0].numpy(), np.int64(37))
+
+        self.assertEqual(0, np.abs(target[0, 0].numpy() - result).sum())
+
+    def test_fast_forward(self):
+        """
+        Test that a glider crosses the torus edges under fast_forward,
+        and that a small node cache still gives the right result
+        """
+
+        env = CARLE(instances=2, hashlife_nodes=256)
+        env_dense = CARLE(instances=2)
+
+        for my_env in [env, env_dense]:
+            _ = my_env.reset()
+            _ = my_env.step(get_glider())
+
+        obs = env.fast_forward(1000)[0]
+        obs_dense = env_dense.rollout(1000)[0]
+
+        self.assertEqual(1001, env.step_number)
+        self.assertEqual(10.0, obs.sum().item())
+        self.assertEqual(0.0, (obs - obs_dense).abs().sum().item())
+
+if __name__ == "__main__":
+
+    unittest.main(verbosity=2)
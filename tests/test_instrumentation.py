@@ -0,0 +1,66 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+
+from carle.env import CARLE
+from carle.mcl import ParsimonyBonus, CornerBonus
+
+class TestStepTimer(unittest.TestCase):
+
+    def setUp(self):
+
+        np.random.seed(42)
+        torch.random.manual_seed(42)
+
+    def test_timing(self):
+        """
+        Test per-layer call counts and times, dumps, and that disabling
+        restores the original step methods
+        """
+
+        env = CARLE(instances=2, height=64, width=64, \
+                action_height=16, action_width=16)
+        env = ParsimonyBonus(env)
+        env = CornerBonus(env)
+
+        _ = env.reset()
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            dump_path = os.path.join(directory, "timing.jsonl")
+            timer = env.enable_timing(dump_path=dump_path, dump_interval=0.0)
+
+            for step in range(5):
+                _ = env.step(1.0 * (torch.rand(2, 1, 16, 16) < 0.2))
+
+            with open(dump_path, "r") as f:
+                reports = [json.loads(line) for line in f.readlines()]
+
+        self.assertEqual(5, len(reports))
+        self.assertEqual(3, len(timer.names))
+
+        for name in timer.names:
+            self.assertEqual(5, timer.calls[name])
+
+        inclusive = [timer.inclusive[name] for name in timer.names]
+        self.assertEqual(sorted(inclusive, reverse=True), inclusive)
+
+        # exclusive times add up to the outermost inclusive time
+        self.assertAlmostEqual(inclusive[0], sum(timer.exclusive.values()), \
+                places=6)
+
+        self.assertGreater(timer.steps_per_second(), 0.0)
+        self.assertIn("steps / second", timer.summary())
+
+        env.disable_timing()
+
+        for layer in [env, env.env, env.inner_env]:
+            self.assertNotIn("step", layer.__dict__)
+
+if __name__ == "__main__":
+
+    unittest.main(verbosity=2)
@@ -4,7 +4,8 @@ import numpy as np
 import torch
 import matplotlib.pyplot as plt
 
-from carle.mcl import MorphoBonus, PredictionBonus, ParsimonyBonus, get_glider
+from carle.mcl import MorphoBonus, PredictionBonus, ParsimonyBonus, \
+        CornerBonus, SpeedDetector, PufferDetector, FusedDetectors, get_glider
 from carle.env import CARLE
 
 class TestPredictionBonus(unittest.TestCase):
@@ -52,6 +53,31 @@ class TestPredictionBonus(unittest.TestCase):
         self.assertGreater(reward, initial_reward)
         self.assertGreater(reward, second_reward)
 
+    def test_grid_buffer(self):
+        """
+        Test that the model sees the frame from `prediction_steps` back
+        """
+
+        env = PredictionBonus(CARLE(device="cpu", instances=2, \
+                height=32, width=32, action_height=8, action_width=8))
+        env.prediction_steps = 2
+
+        inputs = []
+        env.forward = lambda obs: inputs.append(obs) or obs
+
+        frames = [1.0 * (torch.rand(2, 1, 32, 32) < 0.5) for step in range(5)]
+
+        for frame in frames:
+            loss = env.get_bonus(frame)
+
+        self.assertEqual(torch.uint8, env.grid_buffer.dtype)
+        self.assertEqual((2, 2, 1, 32, 32), env.grid_buffer.shape)
+
+        for step, my_input in enumerate(inputs):
+            expected = frames[max(0, step - env.prediction_steps)]
+
+            self.assertEqual(0.0, (my_input - expected).abs().sum().item())
+
 class TestParsimonyBonus(unittest.TestCase):
 
     def setUp(self):
@@ -99,7 +125,185 @@ class TestParsimonyBonus(unittest.TestCase):
         # should be about 20 times less 
         self.assertLess(abs(rewards[-1]), abs(rewards[0])/10)
 
+    def test_rollout_done(self):
+        """
+        Test that wrapper rollouts report instances done at any step
+        """
+
+        env = ParsimonyBonus(CARLE(device="cpu", instances=2, \
+                height=64, width=64, action_height=16, action_width=16, \
+                max_steps=3))
+        _ = env.reset()
+
+        # done after the third step, not after the fourth
+        obs, reward, done, info = env.rollout(4)
+
+        self.assertEqual([[1.0], [1.0]], done.tolist())
+
+        with self.assertRaises(AssertionError):
+            _ = env.rollout(2, stride=3)
+
+
+class TestSpeedDetector(unittest.TestCase):
+
+    def test_glider(self):
+        """
+        Test per-instance glider velocity, across the edges of the torus
+        """
+
+        env = SpeedDetector(CARLE(device="cpu", instances=2, \
+                height=64, width=48, action_height=16, action_width=16))
+        env.rules_from_string("B3/S23")
+
+        _ = env.reset()
+
+        # a glider moving down and right, about to cross the corner
+        universe = torch.zeros(2, 1, 64, 48)
+        universe[0, 0, 61, 46] = 1.0
+        universe[0, 0, 62, 47] = 1.0
+        universe[0, 0, 63, 45:48] = 1.0
+
+        env.inner_env.universe = universe
+
+        action = torch.zeros(1, 1, 16, 16)
+
+        _ = env.step(action)
+
+        displacement = torch.zeros(2, 2)
+        for step in range(8):
+            obs, reward, done, info = env.step(action)
+
+            displacement += env.velocity
+
+            self.assertLess(env.speed[0].item(), 2.0)
+            self.assertEqual(0.0, reward[1].item())
+
+        # two glider periods, one cell down and right each
+        self.assertLess((displacement[0] - 2.0).abs().max().item(), 1e-3)
+        self.assertEqual(0.0, displacement[1].abs().sum().item())
+
+    def test_autoreset(self):
+        """
+        Test that autoreset instances don't get speed from their
+        previous episode
+        """
+
+        env = SpeedDetector(CARLE(device="cpu", instances=2, \
+                height=64, width=64, action_height=16, action_width=16, \
+                max_steps=3, alive_rate=0.2))
+
+        _ = env.reset()
+
+        action = torch.zeros(1, 1, 16, 16)
+
+        for step in range(3):
+            obs, reward, done, info = env.step(action)
+
+        self.assertEqual([[1.0], [1.0]], done.tolist())
+        self.assertEqual([0.0, 0.0], env.speed.tolist())
+        self.assertEqual([[0.0], [0.0]], reward.tolist())
+
+class TestPufferDetector(unittest.TestCase):
+
+    def test_per_instance(self):
+        """
+        Test that growth is rewarded per instance, and that an action only
+        restarts the window of the instance that acted
+        """
+
+        env = PufferDetector(CARLE(device="cpu", instances=2))
+        env.growth_threshold = 4
+
+        no_action = torch.zeros(1, 1, env.action_height, env.action_width)
+
+        # instance 0 grows, instance 1 stays the same
+        for step in range(3):
+            stats = torch.tensor([[10.0 + step], [10.0]])
+            bonus = env.bonus_from_stats(stats, no_action)
+
+            self.assertEqual(0.0, bonus.sum().item())
+
+        for step in range(3, 8):
+            stats = torch.tensor([[10.0 + step], [10.0]])
+            bonus = env.bonus_from_stats(stats, no_action)
+
+            self.assertEqual([[1.0], [0.0]], bonus.tolist())
+
+        action = torch.zeros(2, 1, env.action_height, env.action_width)
+        action[0, :, 0, 0] = 1.0
+
+        bonus = env.bonus_from_stats(torch.tensor([[20.0], [10.0]]), action)
+
+        self.assertEqual([[0.0], [0.0]], bonus.tolist())
+        self.assertEqual([0, 4], env.cell_counts.tolist())
+
+        _ = env.reset()
+        _ = env.reset_instances([1])
+
+        self.assertEqual([0, 0], env.cell_counts.tolist())
+
+class TestFusedDetectors(unittest.TestCase):
+
+    def setUp(self):
+
+        np.random.seed(42)
+        torch.random.manual_seed(42)
+
+    def test_matches_stacked(self):
+        """
+        Test that fused detector rewards match stacked detector wrappers
+        """
+
+        detectors = [CornerBonus, SpeedDetector, PufferDetector]
+        reward_scales = [1e-2, 0.5, 2.0]
+
+        env = CARLE(device="cpu", instances=2)
+        for detector, reward_scale in zip(detectors, reward_scales):
+            env = detector(env)
+            env.reward_scale = reward_scale
+
+        env.growth_threshold = 2
+
+        fused_env = FusedDetectors(CARLE(device="cpu", instances=2), \
+                detectors=detectors, reward_scales=reward_scales)
+        fused_env.detectors[-1].growth_threshold = 2
+
+        env.rules_from_string("B3/S23")
+        fused_env.rules_from_string("B3/S23")
+
+        _ = env.reset()
+        _ = fused_env.reset()
+
+        action = get_glider()
+
+        for step in range(8):
+
+            obs, reward, done, info = env.step(action)
+            fused_obs, fused_reward, done, info = fused_env.step(action)
+
+            self.assertEqual(0.0, (obs - fused_obs).abs().sum().item())
+            self.assertLess((reward - fused_reward).abs().max().item(), 1e-3)
+
+            action = action * 0.0
+
+    def test_buffers(self):
+        """
+        Test that detector masks and stacked weights are module buffers,
+        so they follow the fused module across devices and into state dicts
+        """
+
+        env = FusedDetectors(CARLE(device="cpu", instances=2), \
+                detectors=[CornerBonus, SpeedDetector, PufferDetector])
+
+        buffers = dict(env.named_buffers())
+
+        for name in ["stat_weights", "detectors.0.reward_mask", \
+                "detectors.0.punish_mask", "detectors.1.moment_weights", \
+                "detectors.2.stat_weights"]:
+            self.assertIn(name, buffers)
+            self.assertIn(name, env.state_dict())
 
+        self.assertEqual((256 * 256, 8), tuple(env.stat_weights.shape))
 
 if __name__ == "__main__":
 
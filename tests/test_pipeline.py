@@ -0,0 +1,105 @@
+import unittest
+
+import numpy as np
+import torch
+
+from carle.env import CARLE
+from carle.mcl import ParsimonyBonus
+from carle.pipeline import PipelinedRunner
+
+def window_agent(obs):
+    """
+    a deterministic agent: toggle the cells alive in the top-left window
+    """
+
+    return obs[:, :, :16, :16]
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+
+        np.random.seed(42)
+        torch.random.manual_seed(42)
+
+    def make_env(self, wrap=False):
+
+        env = CARLE(instances=2, height=64, width=64, \
+                action_height=16, action_width=16)
+
+        if wrap:
+            env = ParsimonyBonus(env)
+
+        return env
+
+    def test_step_async(self):
+        """
+        Test that async steps match steps, for CARLE and a wrapper stack
+        """
+
+        for wrap in [False, True]:
+
+            env = self.make_env(wrap)
+            async_env = self.make_env(wrap)
+
+            _ = env.reset()
+            _ = async_env.reset()
+
+            for step in range(4):
+                action = 1.0 * (torch.rand(2, 1, 16, 16) < 0.3)
+
+                obs, reward, done, info = env.step(action)
+
+                future = async_env.step_async(action)
+                async_obs, async_reward, async_done, async_info = \
+                        async_env.step_wait()
+
+                self.assertTrue(future.done())
+                self.assertEqual(0.0, (obs - async_obs).abs().sum().item())
+                self.assertEqual(0.0, (reward - async_reward).abs().sum().item())
+
+    def test_runner(self):
+        """
+        Test that pipelined groups follow the same trajectories as groups
+        stepped one after another
+        """
+
+        envs = [self.make_env() for group in range(2)]
+        pipelined_envs = [self.make_env() for group in range(2)]
+
+        seeds = [1.0 * (torch.rand(2, 1, 16, 16) < 0.3) for group in range(2)]
+
+        observations = []
+        for env, seed in zip(envs, seeds):
+            obs = env.reset()
+            obs = env.step(seed)[0]
+
+            for step in range(4):
+                obs = env.step(window_agent(obs))[0]
+
+            observations.append(obs)
+
+        first_steps = [True, True]
+
+        def agent(obs):
+            # the first action of each group is its seed
+            for group in range(2):
+                if first_steps[group]:
+                    first_steps[group] = False
+
+                    return seeds[group]
+
+            return window_agent(obs)
+
+        runner = PipelinedRunner(pipelined_envs, agent)
+
+        results = list(runner.run(5))
+
+        self.assertEqual([0, 1] * 5, [result[0] for result in results])
+
+        for group in range(2):
+            self.assertEqual(0.0, \
+                    (observations[group] - results[-2 + group][1]).abs().sum().item())
+
+if __name__ == "__main__":
+
+    unittest.main(verbosity=2)
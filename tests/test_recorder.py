@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+from PIL import Image, ImageSequence
+
+from carle.env import CARLE
+from carle.recorder import FrameRecorder, load_frames
+
+class TestFrameRecorder(unittest.TestCase):
+
+    def setUp(self):
+
+        np.random.seed(42)
+        torch.random.manual_seed(42)
+
+    def record(self, filepath, steps=6, **kwargs):
+
+        env = CARLE(height=64, width=64, action_height=16, action_width=16, \
+                instances=3)
+        obs = env.reset()
+
+        recorder = FrameRecorder(filepath, instances=3, **kwargs)
+        canvases = []
+
+        for step in range(steps):
+            action = 1.0 * (torch.rand(3, 1, 16, 16) < 0.2)
+            obs, reward, done, info = env.step(action)
+
+            recorder.add(obs)
+            canvases.append(recorder.to_canvas(obs))
+
+        recorder.close()
+
+        return np.stack(canvases)
+
+    def test_canvas(self):
+
+        recorder = FrameRecorder("test.npy", instances=[1, 2, 3], scale=2)
+
+        universe = torch.zeros(4, 1, 8, 8)
+        universe[2, 0, 3, 4] = 1.0
+
+        canvas = recorder.to_canvas(universe)
+
+        # 2 x 2 grid of 16 x 16 instances with a 1 pixel border
+        self.assertEqual((33, 33), canvas.shape)
+        self.assertEqual(4, np.sum(canvas == 126))
+        self.assertEqual(126, canvas[6, 17 + 8])
+
+    def test_stacks(self):
+        """
+        Test that streamed .npy and chunked .npz recordings load back
+        """
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            for extension in ["npy", "npz"]:
+
+                filepath = os.path.join(directory, "test." + extension)
+                canvases = self.record(filepath, max_memory=3 * 129 * 129)
+
+                self.assertTrue(np.array_equal(canvases, load_frames(filepath)))
+
+    def test_gif(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            filepath = os.path.join(directory, "test.gif")
+            canvases = self.record(filepath)
+
+            with Image.open(filepath) as gif:
+
+                frames = [np.array(frame.convert("RGB")) \
+                        for frame in ImageSequence.Iterator(gif)]
+
+        palette = FrameRecorder(filepath).palette
+
+        self.assertEqual(canvases.shape[0], len(frames))
+
+        for canvas, frame in zip(canvases, frames):
+            self.assertTrue(np.array_equal(palette[canvas], frame))
+
+if __name__ == "__main__":
+
+    unittest.main(verbosity=2)
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+import torch
+
+from carle.env import CARLE
+from carle.sink import AsyncSink, RotatingFile
+
+class TestAsyncSink(unittest.TestCase):
+
+    def setUp(self):
+
+        np.random.seed(42)
+        torch.random.manual_seed(42)
+
+    def test_policies(self):
+        """
+        Test that writes run in order, and that the drop policy discards
+        writes while the worker is busy
+        """
+
+        results = []
+
+        sink = AsyncSink(max_queue=4)
+        for ii in range(32):
+            sink.put(results.append, ii)
+
+        sink.flush()
+        self.assertEqual(list(range(32)), results)
+        sink.close()
+
+        release = threading.Event()
+
+        sink = AsyncSink(max_queue=2, policy="drop")
+        sink.put(release.wait)
+
+        # at most 2 writes can wait behind the blocked one
+        accepted = [sink.put(results.append, ii) for ii in range(8)]
+
+        release.set()
+        sink.close()
+
+        self.assertGreaterEqual(sink.dropped, 6)
+        self.assertEqual(sink.dropped, accepted.count(False))
+
+    def test_rotation(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            filepath = os.path.join(directory, "log.csv")
+            log_file = RotatingFile(filepath, max_bytes=64, backups=2, \
+                    header="a,b,\n")
+
+            for ii in range(20):
+                log_file.write("{},{},\n".format(ii, ii))
+
+            log_file.close()
+
+            self.assertTrue(os.path.exists(filepath + ".1"))
+            self.assertTrue(os.path.exists(filepath + ".2"))
+            self.assertFalse(os.path.exists(filepath + ".3"))
+
+            for suffix in ["", ".1", ".2"]:
+                with open(filepath + suffix, "r") as f:
+                    text = f.read()
+
+                self.assertTrue(text.startswith("a,b,\n"))
+                self.assertLessEqual(len(text), 64)
+
+    def test_env_logging(self):
+        """
+        Test that asynchronous rle logs match synchronous ones
+        """
+
+        cwd = os.getcwd()
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            os.chdir(directory)
+            os.mkdir("logs")
+
+            try:
+                logs = []
+                for async_io in [False, True]:
+
+                    env = CARLE(height=64, width=64, action_height=16, \
+                            action_width=16, logging=True, async_io=async_io)
+                    _ = env.reset()
+
+                    torch.random.manual_seed(42)
+                    for step in range(5):
+                        action = 1.0 * (torch.rand(1, 1, 16, 16) < 0.2)
+                        _ = env.step(action)
+
+                    env.save_log()
+
+                    with open("./logs/carle_log{}.csv"\
+                            .format(env.instance_id), "r") as f:
+                        logs.append(f.read())
+
+                    env.close()
+            finally:
+                os.chdir(cwd)
+
+        self.assertEqual(logs[0], logs[1])
+
+if __name__ == "__main__":
+
+    unittest.main(verbosity=2)
@@ -0,0 +1,74 @@
+import io
+import unittest
+
+import numpy as np
+import torch
+
+from carle.env import CARLE
+from carle.terminal import TerminalRenderer
+
+class TestTerminalRenderer(unittest.TestCase):
+
+    def setUp(self):
+
+        np.random.seed(42)
+        torch.random.manual_seed(42)
+
+    def test_glyphs(self):
+
+        universe = torch.zeros(2, 1, 4, 4)
+        universe[0, 0, 0, 0] = 1.0
+        universe[0, 0, 1, 1] = 1.0
+        universe[0, 0, 3, 3] = 1.0
+        universe[1, 0, 2:4, 0] = 1.0
+
+        renderer = TerminalRenderer(mode="half", instances=2)
+        lines = renderer.get_frame(universe).split("\n")
+
+        self.assertEqual(["", "▀▄       ", "   ▄ █   ", ""], lines)
+
+        renderer = TerminalRenderer(mode="braille")
+        lines = renderer.get_frame(universe).split("\n")
+
+        self.assertEqual(["", chr(0x2800 + 0x01 + 0x10) + chr(0x2800 + 0x80), \
+                ""], lines)
+
+    def test_viewport(self):
+
+        universe = torch.zeros(1, 1, 16, 16)
+        universe[0, 0, 5, 9] = 1.0
+
+        renderer = TerminalRenderer(viewport=(4, 8, 8, 8), downsample=2)
+        cells = renderer.get_cells(universe)
+
+        self.assertEqual((1, 4, 4), cells.shape)
+        self.assertEqual(1, cells.sum())
+        self.assertTrue(cells[0, 0, 0])
+
+    def test_render(self):
+
+        env = CARLE(height=64, width=64, action_height=16, action_width=16, \
+                instances=2)
+        _ = env.reset()
+        _ = env.step(1.0 * (torch.rand(1, 1, 16, 16) < 0.2))
+
+        stream = io.StringIO()
+        env.render(mode="braille", instances=2, stream=stream)
+        env.render()
+        env.render(mode="braille", instances=2, stream=stream)
+
+        frame = stream.getvalue()
+
+        # the renderer is kept, so the screen is only cleared once
+        self.assertEqual(1, frame.count("\x1b[2J"))
+        self.assertEqual(3, frame.count("\x1b[H"))
+        # a title and 64 / 4 lines per frame
+        self.assertEqual(3 * (1 + 16), frame.count("\n"))
+
+        env.render(mode="half", stream=stream)
+
+        self.assertEqual(2, stream.getvalue().count("\x1b[2J"))
+
+if __name__ == "__main__":
+
+    unittest.main(verbosity=2)
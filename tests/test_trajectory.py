@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+
+from carle.env import CARLE
+from carle.trajectory import TrajectoryWriter, TrajectoryReader
+
+class TestTrajectory(unittest.TestCase):
+
+    def setUp(self):
+
+        np.random.seed(42)
+        torch.random.manual_seed(42)
+
+    def test_round_trip(self):
+        """
+        Test that every step of every instance is recovered from a trajectory,
+        in order and by random access, with and without the index
+        """
+
+        env = CARLE(height=64, width=64, action_height=16, action_width=16, \
+                instances=3)
+        _ = env.reset()
+
+        universes, actions = [], []
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            filepath = os.path.join(directory, "test.ctrj")
+            writer = TrajectoryWriter(filepath, env.instances, \
+                    env.height, env.width, env.action_height, \
+                    env.action_width, keyframe_interval=4)
+
+            for step in range(10):
+
+                action = 1.0 * (torch.rand(env.instances, 1, \
+                        env.action_height, env.action_width) < 0.1)
+
+                writer.append(env.universe, action, step)
+
+                universes.append(env.universe.numpy().astype(np.uint8))
+                actions.append(action.numpy().astype(np.uint8))
+
+                _ = env.step(action)
+
+            writer.flush()
+
+            # unclosed files are indexed by scanning
+            reader = TrajectoryReader(filepath)
+            self.assertEqual(10, len(reader))
+            reader.close()
+
+            writer.close()
+            reader = TrajectoryReader(filepath)
+
+            self.assertEqual(10, len(reader))
+
+            for record in [7, 2, 3, 9, 0, 1]:
+
+                universe, action, step = reader.read(record)
+
+                self.assertEqual(record, step)
+                self.assertTrue(np.array_equal(universes[record], universe))
+                self.assertTrue(np.array_equal(actions[record], action))
+
+            self.assertEqual(5, reader.find_step(5))
+
+            reader.close()
+
+    def test_full_size_action(self):
+        """
+        Test that full-size actions are logged as their action window
+        """
+
+        env = CARLE(height=64, width=32, action_height=16, action_width=8, \
+                instances=2)
+        _ = env.reset()
+
+        action = torch.zeros(2, 1, 16, 8)
+        action[:, :, 1:3, 2:5] = 1.0
+
+        full_action = torch.zeros(2, 1, 64, 32)
+        full_action[:, :, 25:27, 14:17] = 1.0
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            filepath = os.path.join(directory, "test.ctrj")
+            writer = TrajectoryWriter(filepath, env.instances, \
+                    env.height, env.width, env.action_height, \
+                    env.action_width)
+
+            writer.append(env.universe, full_action, 0)
+            _ = env.step(full_action)
+
+            writer.close()
+
+            reader = TrajectoryReader(filepath)
+            _, logged_action, _ = reader.read(0)
+            reader.close()
+
+        self.assertTrue(np.array_equal(action.numpy().astype(np.uint8), \
+                logged_action))
+
+if __name__ == "__main__":
+
+    unittest.main(verbosity=2)
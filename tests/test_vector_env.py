@@ -0,0 +1,61 @@
+import unittest
+
+import numpy as np
+import torch
+
+from carle.env import CARLE
+from carle.vector_env import VectorCARLE, pack_bits, unpack_bits
+
+class TestVectorCARLE(unittest.TestCase):
+
+    def setUp(self):
+
+        np.random.seed(42)
+        torch.random.manual_seed(42)
+
+    def test_pack_bits(self):
+
+        cells = 1.0 * (torch.rand(3, 1, 16, 64) < 0.5)
+
+        packed = pack_bits(cells)
+
+        self.assertEqual((3, 1, 16, 8), packed.shape)
+        self.assertTrue(np.array_equal(np.packbits(cells.numpy() != 0, axis=-1), \
+                packed.numpy()))
+        self.assertEqual(0.0, (cells - unpack_bits(packed)).abs().sum().item())
+
+    def test_matches_env(self):
+        """
+        Test that sharded instances step like one vectorized environment
+        """
+
+        env_kwargs = {"height": 64, "width": 64, \
+                "action_height": 16, "action_width": 16}
+
+        env = CARLE(instances=5, **env_kwargs)
+
+        for packed in [True, False]:
+
+            vector_env = VectorCARLE(instances=5, workers=2, \
+                    env_kwargs=env_kwargs, packed=packed)
+
+            obs = env.reset()
+            vector_obs = vector_env.reset()
+
+            self.assertEqual(obs.shape, vector_obs.shape)
+
+            for step in range(4):
+                action = 1.0 * (torch.rand(5, 1, 16, 16) < 0.2)
+
+                obs, reward, done, info = env.step(action)
+                vector_obs, vector_reward, vector_done, vector_info = \
+                        vector_env.step(action)
+
+                self.assertEqual(0.0, (obs - vector_obs).abs().sum().item())
+                self.assertEqual((5, 1), vector_reward.shape)
+
+            vector_env.close()
+
+if __name__ == "__main__":
+
+    unittest.main(verbosity=2)